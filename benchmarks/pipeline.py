@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Throughput and peak-memory benchmarks for the correction pipeline
+
+Generates synthetic GPX tracks (1k, 100k and 1M points by default) and runs the
+pipeline on each, against a fake in-process ElevationSource and, for the smaller
+sizes, a local stub of the USGS Point Query Service. Every case runs in a fresh
+subprocess so its peak RSS is its own.
+
+    python benchmarks/pipeline.py
+    python benchmarks/pipeline.py --sizes 1000 100000 --save data/bench.json
+    python benchmarks/pipeline.py --baseline data/bench.json    # exit 1 on regressions
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+SRC = Path(__file__).resolve().parent.parent / 'src'
+sys.path.insert(0, str(SRC))
+
+from elevation_sources import ElevationSource
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+DEFAULT_MODES = ['standard', 'stream']
+
+def synthetic_elevation(latitude, longitude):
+    """Smooth rolling terrain, works on floats and NumPy arrays alike"""
+    return 200 + 80 * (latitude - 44.0) * 100 + 25 * ((longitude + 69.0) * 300 % 1)
+
+def generate_gpx(path, points, segment_size=50000):
+    """Write a synthetic 1 Hz track with noisy GPS elevations"""
+    with open(path, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="benchmark">\n'
+                '  <trk>\n    <name>Synthetic</name>\n    <trkseg>\n')
+        for i in range(points):
+            if i and i % segment_size == 0:
+                f.write('    </trkseg>\n    <trkseg>\n')
+            latitude = 44.0 + i * 2e-6
+            longitude = -69.0 + 1e-4 * math.sin(i / 500)
+            elevation = synthetic_elevation(latitude, longitude) + 3 * math.sin(i / 7)
+            f.write(f'      <trkpt lat="{latitude:.7f}" lon="{longitude:.7f}">'
+                    f'<ele>{elevation:.1f}</ele>'
+                    f'<time>2024-01-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z</time></trkpt>\n')
+        f.write('    </trkseg>\n  </trk>\n</gpx>\n')
+
+class FakeElevationSource(ElevationSource):
+    """In-process analytic terrain, measures the pipeline without any I/O"""
+
+    def get_elevation(self, latitude, longitude):
+        return float(synthetic_elevation(latitude, longitude))
+
+    def get_elevations_array(self, latitudes, longitudes):
+        return synthetic_elevation(latitudes, longitudes)
+
+    def get_name(self):
+        return "Fake terrain"
+
+class StubUSGSHandler(BaseHTTPRequestHandler):
+    """Answers Point Query Service requests from the synthetic terrain"""
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes, without this each keep-alive response waits on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        elevation = synthetic_elevation(float(query['y'][0]), float(query['x'][0]))
+        body = json.dumps({'value': str(elevation)}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server():
+    """Serve the stub on a free local port, Returns (server, url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubUSGSHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+def run_case(input_path, source, mode, stub_url):
+    """Run one case in this process, Returns its measurements"""
+    from cli_utils import parse_args
+    from elevation_cache import MemoryElevationCache
+    from elevation_sources import USGSPointQuerySource
+    from main import process_gpx_file
+
+    argv = [input_path, '--no-viz'] + (['--stream'] if mode == 'stream' else [])
+    args = parse_args(argv)
+    if source == 'fake':
+        elevation_source = FakeElevationSource()
+    else:
+        # Empty cache, so every point is a round trip to the stub
+        elevation_source = USGSPointQuerySource(cache=MemoryElevationCache(), base_url=stub_url)
+
+    output_path = input_path.replace('.gpx', f'_{source}_{mode}_out.gpx')
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = process_gpx_file(input_path, output_path, args, elevation_source)
+    seconds = time.perf_counter() - start
+
+    return {
+        'seconds': round(seconds, 4),
+        'points': result['points'],
+        'points_per_second': round(result['points'] / seconds, 1),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'profile': result['profile'],
+    }
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions against a previous run's results"""
+    previous = {(case['size'], case['source'], case['mode']): case for case in baseline}
+    regressions = []
+    for case in results:
+        before = previous.get((case['size'], case['source'], case['mode']))
+        if before is None:
+            continue
+        name = f"{case['size']} points / {case['source']} / {case['mode']}"
+        if case['points_per_second'] < before['points_per_second'] * (1 - tolerance):
+            regressions.append(f"{name}: {case['points_per_second']:.0f} points/s, "
+                               f"was {before['points_per_second']:.0f}")
+        if case['peak_rss_mb'] > before['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{name}: peak {case['peak_rss_mb']:.0f}MB, was {before['peak_rss_mb']:.0f}MB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Track sizes in points (default: 1000 100000 1000000)')
+    parser.add_argument('--modes', nargs='+', choices=DEFAULT_MODES, default=DEFAULT_MODES,
+                        help='Pipeline modes to run (default: standard stream)')
+    parser.add_argument('--stub-max-points', type=int, default=10000,
+                        help='Largest size also run against the stub USGS server (default: 10000)')
+    parser.add_argument('--workdir', help='Where to keep generated tracks (default: a temporary directory)')
+    parser.add_argument('--save', help='Write results as JSON to this path')
+    parser.add_argument('--baseline', help='Previous --save output to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed slowdown / memory growth before failing (default: 0.2)')
+    parser.add_argument('--run-case', nargs=4, metavar=('GPX', 'SOURCE', 'MODE', 'STUB_URL'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(*args.run_case)))
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='gpx-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    server, stub_url = start_stub_server()
+
+    results = []
+    print(f"{'points':>9} {'source':>6} {'mode':>9} {'seconds':>9} {'points/s':>11} {'peak MB':>8}")
+    try:
+        for size in args.sizes:
+            input_path = os.path.join(workdir, f'synthetic_{size}.gpx')
+            if not os.path.exists(input_path):
+                generate_gpx(input_path, size)
+
+            sources = ['fake'] + (['stub'] if size <= args.stub_max_points else [])
+            for source in sources:
+                for mode in args.modes:
+                    output = subprocess.run(
+                        [sys.executable, __file__, '--run-case', input_path, source, mode, stub_url],
+                        capture_output=True, text=True, check=True)
+                    case = {'size': size, 'source': source, 'mode': mode, **json.loads(output.stdout)}
+                    results.append(case)
+                    print(f"{size:>9} {source:>6} {mode:>9} {case['seconds']:>9.3f} "
+                          f"{case['points_per_second']:>11.0f} {case['peak_rss_mb']:>8.1f}")
+    finally:
+        server.shutdown()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
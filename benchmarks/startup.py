@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Cold-start import budget for the CLI
+
+Runs `cli.py --help` under `python -X importtime`, which executes every module-level
+import on the `--no-viz` path and exits before any work. Fails if the import time
+exceeds the budget or if a heavy dependency that should be loaded lazily shows up.
+
+    python benchmarks/startup.py --budget-ms 300
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+CLI = Path(__file__).resolve().parent.parent / 'cli.py'
+
+# Only the code paths that need these may import them
+LAZY_MODULES = ('matplotlib', 'rasterio', 'requests', 'srtm')
+
+# Interpreter startup, paid before cli.py runs and outside this repo's control
+INTERPRETER_MODULES = ('site', 'encodings')
+
+def measure_imports():
+    """Run the CLI once, Returns (total import ms, {top-level package: cumulative ms})"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', str(CLI), '--help'],
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        package = name.split('.')[0]
+        modules[package] = max(modules.get(package, 0), int(cumulative) / 1000)
+        # Only top-level imports (no indentation) count towards the total
+        top_level = not line.split('|')[2].startswith('  ')
+        if top_level and package not in INTERPRETER_MODULES:
+            total_us += int(cumulative)
+    return total_us / 1000, modules
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=300,
+                        help='Maximum cold-start import time in milliseconds (default: 300)')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='Runs to take the fastest of, to smooth out noise (default: 5)')
+    args = parser.parse_args()
+
+    runs = [measure_imports() for _ in range(args.runs)]
+    total, modules = min(runs, key=lambda run: run[0])
+
+    print(f"Cold-start imports: {total:.1f}ms (budget {args.budget_ms:g}ms, best of {args.runs})")
+    for name, elapsed in sorted(modules.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {name:<24} {elapsed:8.1f}ms")
+
+    failures = []
+    loaded = [name for name in LAZY_MODULES if name in modules]
+    if loaded:
+        failures.append(f"imported at startup but should be lazy: {', '.join(loaded)}")
+    if total > args.budget_ms:
+        failures.append(f"import time {total:.1f}ms exceeds budget of {args.budget_ms:g}ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
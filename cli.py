@@ -6,7 +6,9 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent / 'src'))
 
 from cli_utils import parse_args, get_output_path, find_gpx_files
-from main import process_gpx_file 
+from main import process_gpx_file
+from manifest import Manifest, settings_for
+from profiling import write_profile
 
 def main():
     args = parse_args()
@@ -23,13 +25,26 @@ def main():
             print(f"No GPX files found in {args.input}")
             sys.exit(1)
 
-        print(f"Found {len(gpx_files)} GPX files to process/n")
+        print(f"Found {len(gpx_files)} GPX files to process with {args.jobs} job(s)\n")
 
-        for i, gpx_file in enumerate(gpx_files, 1):
-            print(f"[{i}/{len(gpx_files)}] Processing {gpx_file.name}...")
-            output_path = get_output_path(gpx_file, None)
-            process_gpx_file(str(gpx_file), str(output_path), args)
-            print()
+        from batch import run_batch, write_report
+
+        jobs = [(gpx_file, get_output_path(gpx_file, None)) for gpx_file in gpx_files]
+        results, prefetch_profile = run_batch(jobs, args)
+
+        write_report(results, args.report)
+        if args.profile:
+            profile = {result['file']: result.get('profile') for result in results}
+            if prefetch_profile:
+                # The cross-file prefetch the per-file profiles don't see
+                profile = {'prefetch': prefetch_profile, **profile}
+            write_profile(profile, args.profile)
+        failed = [result for result in results if result['status'] == 'failed']
+        skipped = [result for result in results if result['status'] == 'skipped']
+        print(f"\nProcessed {len(results) - len(failed) - len(skipped)} of {len(results)} files "
+              f"({len(skipped)} unchanged), report saved to {args.report}")
+        if failed:
+            sys.exit(1)
 
     else:
         # Single file mode
@@ -38,7 +53,19 @@ def main():
             sys.exit(1)
 
         output_path = get_output_path(args.input, args.output)
-        process_gpx_file(args.input, str(output_path), args)
+        manifest = Manifest(args.manifest)
+        settings = settings_for(args)
+        input_hash, previous, reuse = manifest.plan(args.input, output_path, settings, args.force)
+        if previous is not None:
+            print(f"{args.input} is unchanged since the last run, {output_path} is up to date "
+                  f"(use --force to correct it again)")
+            return
+
+        result = process_gpx_file(args.input, str(output_path), args, reuse=reuse)
+        manifest.record(args.input, input_hash, output_path, settings, result)
+        manifest.save()
+        if args.profile:
+            write_profile(result['profile'], args.profile)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
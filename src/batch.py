@@ -0,0 +1,229 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import contextlib
+from functools import partial
+import csv
+import io
+import json
+import os
+import time
+import traceback
+import xml.etree.ElementTree as ET
+import numpy as np
+from elevation_cache import QUANTIZATION
+from lookup_reduction import LookupPlan
+from main import create_elevation_source, process_gpx_file
+from manifest import Manifest, settings_for
+from profiling import StageProfiler
+from visualization import render_profile
+
+REPORT_FIELDS = ['file', 'output', 'status', 'error', 'seconds', 'points', 'segments', 'reused_segments',
+                 'queries', 'distance_km', 'corrected', 'filled', 'outliers', 'smoothed', 'avg_change',
+                 'large_changes', 'original_gain', 'original_loss', 'corrected_gain', 'corrected_loss']
+
+# One elevation source per worker process, built by _init_worker
+_worker_source = None
+_worker_args = None
+
+def read_coordinates(input_path):
+    """Read every track point's lat/lon without building the GPX object tree
+
+    Returns (latitudes, longitudes, segment_offsets) laid out the same way as Track.
+    """
+    latitudes, longitudes = [], []
+    segment_offsets = [0]
+    for _, element in ET.iterparse(input_path, events=('end',)):
+        name = element.tag.rsplit('}', 1)[-1]
+        if name == 'trkpt':
+            latitudes.append(float(element.get('lat')))
+            longitudes.append(float(element.get('lon')))
+            element.clear()
+        elif name == 'trkseg':
+            segment_offsets.append(len(latitudes))
+    return np.array(latitudes), np.array(longitudes), np.array(segment_offsets, dtype=np.int64)
+
+def lookup_coordinates(input_path, snap_grid=None, simplify=None):
+    """Coordinates correcting input_path will look up, after any grid snapping and simplification
+
+    Returns (latitudes, longitudes, point_count).
+    """
+    latitudes, longitudes, segment_offsets = read_coordinates(input_path)
+    point_count = len(latitudes)
+    if point_count and (snap_grid or simplify):
+        plan = LookupPlan(latitudes, longitudes, segment_offsets, snap_grid, simplify)
+        latitudes, longitudes = plan.latitudes, plan.longitudes
+    return latitudes, longitudes, point_count
+
+def unique_coordinates(coordinates):
+    """Merge (latitudes, longitudes) arrays from many files, dropping repeats at cache precision"""
+    if not coordinates:
+        return np.empty(0), np.empty(0)
+    latitudes = np.concatenate([lats for lats, _ in coordinates])
+    longitudes = np.concatenate([lons for _, lons in coordinates])
+    keys = np.unique(np.round(np.column_stack((latitudes, longitudes)) * QUANTIZATION), axis=0)
+    return keys[:, 0] / QUANTIZATION, keys[:, 1] / QUANTIZATION
+
+def _init_worker(args):
+    global _worker_source, _worker_args
+    _worker_args = args
+    _worker_source = create_elevation_source(args)
+
+def _lookup_coordinates_safely(input_path, snap_grid=None, simplify=None):
+    try:
+        return lookup_coordinates(input_path, snap_grid, simplify)
+    except Exception:
+        return None
+
+def _process_file(input_path, output_path, args=None, elevation_source=None, reuse=None):
+    """Process one file, capturing its output and any error instead of raising"""
+    args = args or _worker_args
+    elevation_source = elevation_source or _worker_source
+    result = {'file': str(input_path), 'output': str(output_path), 'status': 'ok', 'error': ''}
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log):
+            result.update(process_gpx_file(str(input_path), str(output_path), args, elevation_source, reuse))
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = f"{type(e).__name__}: {e}"
+        log.write(traceback.format_exc())
+    result['seconds'] = round(time.perf_counter() - start, 3)
+    return result, log.getvalue()
+
+def run_batch(jobs, args):
+    """Process (input_path, output_path) pairs, Returns (results, prefetch_profile)
+
+    results holds one result dict per file. prefetch_profile times the up-front
+    prefetch of a remote source and the fetches it made, None when there was none.
+
+    Files unchanged since the run recorded in the manifest are skipped with their
+    previous result, changed files reuse the segments whose points are the same.
+    The elevation source is created once per process. Remote sources get every
+    coordinate across the remaining files deduped and fetched into the shared
+    persistent cache up front, so the per-file work only reads from the cache. With
+    --viz-jobs, profiles are rendered by a second pool while correction carries on.
+    A failing file is reported and the rest of the batch carries on. Only this
+    process writes the manifest, once the batch is done.
+    """
+    manifest = Manifest(args.manifest)
+    settings = settings_for(args)
+    results, pending, input_hashes = [], [], {}
+    for input_path, output_path in jobs:
+        try:
+            input_hash, previous, reuse = manifest.plan(input_path, output_path, settings, args.force)
+        except OSError:
+            # Left for _process_file to report
+            input_hash, previous, reuse = None, None, None
+        if previous is not None:
+            results.append({'file': str(input_path), 'output': str(output_path), 'status': 'skipped',
+                            'error': '', 'seconds': 0.0, **previous})
+        else:
+            input_hashes[str(input_path)] = input_hash
+            pending.append((input_path, output_path, reuse))
+    if results:
+        print(f"Skipping {len(results)} files unchanged since the last run (use --force to correct them again)")
+    if not pending:
+        results.sort(key=lambda result: result['file'])
+        return results, None
+
+    elevation_source = create_elevation_source(args)
+    workers = max(1, args.jobs)
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(args,))
+    render_pool = None
+    if args.viz_jobs and not args.no_viz:
+        render_pool = ProcessPoolExecutor(max_workers=args.viz_jobs)
+    renders = []
+    prefetch_profile = None
+
+    try:
+        if elevation_source.remote:
+            profiler = StageProfiler()
+            source_stats = elevation_source.get_stats()
+            # The same lookups each file's LookupPlan will make, not the raw track points
+            with profiler.stage('read'):
+                paths = [str(input_path) for input_path, _, _ in pending]
+                read = partial(_lookup_coordinates_safely, snap_grid=args.snap_grid, simplify=args.simplify)
+                coordinates = pool.map(read, paths) if pool else map(read, paths)
+                coordinates = [coords for coords in coordinates if coords is not None]
+                latitudes, longitudes = unique_coordinates([(lats, lons) for lats, lons, _ in coordinates])
+            total = sum(points for _, _, points in coordinates)
+            print(f"Prefetching {len(latitudes)} unique coordinates ({total} track points across {len(pending)} files)")
+            with profiler.stage('prefetch'):
+                elevation_source.prefetch(latitudes, longitudes)
+            profiler.count('files', len(coordinates))
+            profiler.count('points', total)
+            profiler.count('queries', len(latitudes))
+            profiler.count_source(source_stats, elevation_source.get_stats())
+            prefetch_profile = profiler.to_dict()
+
+        if pool:
+            futures = [pool.submit(_process_file, input_path, output_path, reuse=reuse)
+                       for input_path, output_path, reuse in pending]
+            completed = as_completed(futures)
+        else:
+            completed = (_process_file(input_path, output_path, args, elevation_source, reuse)
+                         for input_path, output_path, reuse in pending)
+
+        for i, outcome in enumerate(completed, 1):
+            result, log = outcome.result() if pool else outcome
+            results.append(result)
+            render = result.pop('render', None)
+            if render:
+                renders.append((result, render_pool.submit(render_profile, render['series'], render['path'],
+                                                           args.viz_dpi, args.viz_format)))
+            name = os.path.basename(result['file'])
+            if result['status'] == 'ok':
+                print(f"[{i}/{len(pending)}] {name}: {result['points']} points, "
+                      f"gain {result['corrected_gain']:.1f}m, loss {result['corrected_loss']:.1f}m "
+                      f"({result['seconds']:.1f}s)")
+            else:
+                print(f"[{i}/{len(pending)}] {name}: FAILED - {result['error']}")
+            if args.verbose or result['status'] != 'ok':
+                print(log)
+
+        if renders:
+            print(f"Waiting for {sum(not future.done() for _, future in renders)} of {len(renders)} profiles to render")
+        for result, future in renders:
+            try:
+                future.result()
+            except Exception as e:
+                result['status'] = 'failed'
+                result['error'] = f"Rendering profile: {type(e).__name__}: {e}"
+                print(f"{os.path.basename(result['file'])}: FAILED - {result['error']}")
+    finally:
+        if pool:
+            pool.shutdown()
+        if render_pool:
+            render_pool.shutdown()
+
+    for result in results:
+        if result['status'] == 'ok' and input_hashes.get(result['file']):
+            manifest.record(result['file'], input_hashes[result['file']], result['output'], settings, result)
+        result.pop('segment_hashes', None)
+    manifest.save()
+
+    results.sort(key=lambda result: result['file'])
+    return results, prefetch_profile
+
+def write_report(results, report_path):
+    """Write per-file results as CSV, or JSON with totals if the path ends in .json"""
+    directory = os.path.dirname(report_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if report_path.endswith('.json'):
+        succeeded = [result for result in results if result['status'] != 'failed']
+        totals = {'files': len(results), 'failed': len(results) - len(succeeded),
+                  'skipped': sum(result['status'] == 'skipped' for result in results)}
+        for field in ('points', 'corrected', 'original_gain', 'original_loss',
+                      'corrected_gain', 'corrected_loss'):
+            totals[field] = sum(result[field] for result in succeeded)
+        with open(report_path, 'w') as f:
+            json.dump({'totals': totals, 'files': results}, f, indent=2)
+    else:
+        with open(report_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(results)
@@ -1,7 +1,22 @@
 import argparse
 import os
 from pathlib import Path
-def parse_args():
+from elevation_repair import DEFAULT_MAX_GRADE, DEFAULT_SMOOTHING_WINDOW, SMOOTHING_METHODS
+from lookup_reduction import DEFAULT_GRID_M
+from manifest import DEFAULT_MANIFEST
+from visualization import DEFAULT_DPI, FORMATS
+
+TIER_SOURCES = ('dem', 'srtm', 'usgs')
+
+def tier_list(value):
+    """Parse a comma separated --tiers value, Returns the tier names in order"""
+    tiers = [tier.strip() for tier in value.split(',') if tier.strip()]
+    unknown = [tier for tier in tiers if tier not in TIER_SOURCES]
+    if not tiers or unknown:
+        raise argparse.ArgumentTypeError(f"tiers must be a comma separated list of {', '.join(TIER_SOURCES)}")
+    return tiers
+
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(
         description='Correct GPX elevation data using high-resolution elevation sources',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -13,8 +28,29 @@ Examples:
     # Process with SRTM and specify output locaation
     python cli.py input.gpx --output corrected.gpx --source srtm
     
-    # Process all GPX files in a directory
+    # Process offline against local DEM tiles
+    python cli.py input.gpx --source dem --dem data/dem/
+
+    # Prefer local DEM tiles, then SRTM, and only ask USGS for what neither covers
+    python cli.py input.gpx --source tiered --tiers dem,srtm,usgs
+
+    # Cut remote lookups on dense recordings
+    python cli.py input.gpx --snap-grid --simplify 2
+
+    # Correct a very large file with bounded memory
+    python cli.py huge.gpx --stream --chunk-size 5000
+
+    # Process all GPX files in a directory, files unchanged since the last run are skipped
     python cli.py data/input/ --batch
+
+    # Correct every file again, e.g. after updating the DEM tiles
+    python cli.py data/input/ --batch --force
+
+    # Process a directory with 4 worker processes and a JSON summary
+    python cli.py data/input/ --batch --jobs 4 --report data/output/report.json
+
+    # Correct with 4 processes while 2 more render SVG profiles
+    python cli.py data/input/ --batch --jobs 4 --viz-jobs 2 --viz-format svg
     """
     )
 
@@ -25,22 +61,159 @@ Examples:
                         help='Output file path (default: data/output/corrected_<filename>)')
     
     parser.add_argument('-s', '--source',
-                        choices=['srtm', 'usgs'],
+                        choices=['srtm', 'usgs', 'dem', 'tiered'],
                         default='usgs',
                         help='Elevation data source (default: usgs)')
+
+    parser.add_argument('--tiers',
+                        type=tier_list,
+                        default=list(TIER_SOURCES),
+                        help='Sources tried in order by --source tiered, after the memory and persistent '
+                             'caches (default: dem,srtm,usgs, dem is skipped without tiles)')
     
     parser.add_argument('-b', '--batch',
                         action='store_true',
                         help='Batch rocess all GPX files in input directory')
 
+    parser.add_argument('--workers',
+                        type=int,
+                        default=8,
+                        help='Concurrent USGS requests (default: 8)')
+
+    parser.add_argument('--dem',
+                        default='data/dem',
+                        help='GeoTIFF/HGT tile or directory of tiles for --source dem (default: data/dem)')
+
+    parser.add_argument('--usgs-url',
+                        default='https://epqs.nationalmap.gov/v1/json',
+                        help='USGS Point Query Service endpoint (e.g. a local stub server)')
+
+    parser.add_argument('--rate-limit',
+                        type=float,
+                        default=None,
+                        help='Maximum USGS requests per second (default: unlimited)')
+
+    parser.add_argument('--cache',
+                        default='data/cache/elevation_cache.sqlite',
+                        help='Elevation cache database (default: data/cache/elevation_cache.sqlite)')
+
+    parser.add_argument('--cache-max-entries',
+                        type=int,
+                        default=None,
+                        help='Evict least recently used cache entries beyond this count')
+
+    parser.add_argument('--gain-threshold',
+                        type=float,
+                        default=0.0,
+                        help='Ignore elevation changes smaller than this many meters when '
+                             'totalling gain/loss, e.g. 3 (default: 0, count every change)')
+
+    parser.add_argument('--snap-grid',
+                        type=float,
+                        nargs='?',
+                        const=DEFAULT_GRID_M,
+                        default=None,
+                        metavar='METERS',
+                        help=f'Snap points to a grid and look up each cell once '
+                             f'(default grid: {DEFAULT_GRID_M:.1f}m, the 3DEP 1/3 arc-second resolution)')
+
+    parser.add_argument('--simplify',
+                        type=float,
+                        default=None,
+                        metavar='METERS',
+                        help='Only look up Douglas-Peucker vertices at this tolerance and '
+                             'interpolate the rest along distance')
+
+    parser.add_argument('--no-repair',
+                        action='store_true',
+                        help='Write corrected elevations raw, without gap filling or outlier rejection')
+
+    parser.add_argument('--max-grade',
+                        type=float,
+                        default=DEFAULT_MAX_GRADE,
+                        help=f'Reject single-point spikes steeper than this percent grade '
+                             f'(default: {DEFAULT_MAX_GRADE:g}, 0 disables)')
+
+    parser.add_argument('--smooth',
+                        choices=SMOOTHING_METHODS,
+                        default=None,
+                        help='Smooth corrected elevations with a moving median or Savitzky-Golay filter')
+
+    parser.add_argument('--smooth-window',
+                        type=float,
+                        default=DEFAULT_SMOOTHING_WINDOW,
+                        help=f'Smoothing window in meters (default: {DEFAULT_SMOOTHING_WINDOW:g})')
+
+    parser.add_argument('--stream',
+                        action='store_true',
+                        help='Stream the GPX in chunks with bounded memory (for very large files), '
+                             'corrected elevations are written without repair or lookup reduction')
+
+    parser.add_argument('--chunk-size',
+                        type=int,
+                        default=10000,
+                        help='Track points corrected per chunk in --stream mode (default: 10000)')
+
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        default=1,
+                        help='Worker processes for batch mode (default: 1)')
+
+    parser.add_argument('--report',
+                        default='data/output/batch_report.csv',
+                        help='Batch summary report, .csv or .json (default: data/output/batch_report.csv)')
+
+    parser.add_argument('--manifest',
+                        default=DEFAULT_MANIFEST,
+                        help=f'Record of previous runs, used to skip unchanged files and reuse unchanged '
+                             f'segments (default: {DEFAULT_MANIFEST})')
+
+    parser.add_argument('--force',
+                        action='store_true',
+                        help='Correct every file from scratch, even if unchanged since the last run')
+
     parser.add_argument('--no-viz',
                        action='store_true',
                        help='Skip visualization generation')
 
+    parser.add_argument('--viz-dpi',
+                        type=int,
+                        default=DEFAULT_DPI,
+                        help=f'Resolution of the elevation profile image (default: {DEFAULT_DPI})')
+
+    parser.add_argument('--viz-format',
+                        choices=FORMATS,
+                        default='png',
+                        help='Elevation profile image format (default: png)')
+
+    parser.add_argument('--viz-jobs',
+                        type=int,
+                        default=0,
+                        help='Render profiles in a separate pool of this many processes in batch mode '
+                             '(default: 0, render in the correcting process)')
+
+    parser.add_argument('--profile',
+                        nargs='?',
+                        const='-',
+                        default=None,
+                        metavar='PATH',
+                        help='Emit per-stage timings, point counts and cache/fetch counters as JSON '
+                             '(to stdout, or to PATH)')
+
     parser.add_argument('-v', '--verbose',
                         action='store_true',
                         help='Enable verbose output')
-    return parser.parse_args()
+    args = parser.parse_args(argv)
+
+    # Streaming corrects each chunk as it goes, without the whole-track repair and lookup reduction stages
+    if args.stream:
+        unsupported = [option for option, used in (('--smooth', args.smooth),
+                                                   ('--max-grade', args.max_grade != DEFAULT_MAX_GRADE),
+                                                   ('--snap-grid', args.snap_grid),
+                                                   ('--simplify', args.simplify)) if used]
+        if unsupported:
+            parser.error(f"{', '.join(unsupported)} can't be used with --stream")
+    return args
 
 def get_output_path(input_path, output_arg):
     """Generate output path if not specified"""
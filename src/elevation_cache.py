@@ -0,0 +1,170 @@
+from abc import ABC, abstractmethod
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Coordinates are stored as integer micro-degrees (~0.1m), the precision of the old JSON keys
+QUANTIZATION = 1e6
+
+# Row-value pairs per SELECT, keeps the bound parameter count well under SQLite's limit
+QUERY_CHUNK_SIZE = 400
+
+def quantize(latitude, longitude):
+    """Return the integer cache key for a coordinate"""
+    return round(latitude * QUANTIZATION), round(longitude * QUANTIZATION)
+
+class ElevationCache(ABC):
+    """Abstract base class for persistent elevation caches keyed on quantized lat/lon"""
+
+    @abstractmethod
+    def get_many(self, keys):
+        """Look up quantized keys, Returns a dict containing only the cached ones"""
+        pass
+
+    @abstractmethod
+    def put_many(self, elevations):
+        """Store a dict of quantized key -> elevation in one batch"""
+        pass
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    def close(self):
+        """Release any resources held by the cache"""
+        pass
+
+class MemoryElevationCache(ElevationCache):
+    """Non-persistent cache, useful for tests and one-off runs"""
+
+    def __init__(self):
+        self.elevations = {}
+
+    def get_many(self, keys):
+        return {key: self.elevations[key] for key in keys if key in self.elevations}
+
+    def put_many(self, elevations):
+        self.elevations.update(elevations)
+
+    def __len__(self):
+        return len(self.elevations)
+
+class SQLiteElevationCache(ElevationCache):
+    """SQLite cache in WAL mode, safe to share between threads and processes"""
+
+    def __init__(self, path='data/cache/elevation_cache.sqlite', max_entries=None,
+                 legacy_json=None, timeout=30):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Autocommit mode, transactions are opened explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS elevations (
+                lat INTEGER NOT NULL,
+                lon INTEGER NOT NULL,
+                elevation REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (lat, lon)
+            ) WITHOUT ROWID""")
+        self.conn.execute('CREATE INDEX IF NOT EXISTS elevations_last_used ON elevations (last_used)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+        if legacy_json:
+            self._migrate_json(legacy_json)
+
+    def _migrate_json(self, json_path):
+        """One-time import of the old usgs_cache.json file, the file itself is left in place"""
+        meta_key = f"migrated:{os.path.abspath(json_path)}"
+        if not os.path.exists(json_path):
+            return
+        if self.conn.execute('SELECT 1 FROM meta WHERE key = ?', (meta_key,)).fetchone():
+            return
+
+        try:
+            with open(json_path, 'r') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: could not migrate {json_path}: {e}")
+            return
+
+        elevations = {}
+        for key, elevation in legacy.items():
+            latitude, longitude = (float(value) for value in key.split(','))
+            elevations[quantize(latitude, longitude)] = elevation
+
+        self.put_many(elevations)
+        with self._lock:
+            self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                              (meta_key, str(len(elevations))))
+        print(f"Migrated {len(elevations)} cached elevations from {json_path}")
+
+    def get_many(self, keys):
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), QUERY_CHUNK_SIZE):
+                chunk = keys[i:i + QUERY_CHUNK_SIZE]
+                placeholders = ','.join(['(?, ?)'] * len(chunk))
+                params = [value for key in chunk for value in key]
+                rows = self.conn.execute(
+                    f'SELECT lat, lon, elevation FROM elevations WHERE (lat, lon) IN (VALUES {placeholders})',
+                    params)
+                for lat, lon, elevation in rows:
+                    found[(lat, lon)] = elevation
+
+            # Refresh recency for LRU eviction, only worth the write when a cap is set
+            if found and self.max_entries:
+                now = time.time()
+                self._write(lambda: self.conn.executemany(
+                    'UPDATE elevations SET last_used = ? WHERE lat = ? AND lon = ?',
+                    [(now, lat, lon) for lat, lon in found]))
+        return found
+
+    def put_many(self, elevations):
+        if not elevations:
+            return
+        now = time.time()
+        rows = [(lat, lon, elevation, now) for (lat, lon), elevation in elevations.items()]
+        with self._lock:
+            self._write(lambda: self.conn.executemany(
+                'INSERT OR REPLACE INTO elevations (lat, lon, elevation, last_used) VALUES (?, ?, ?, ?)',
+                rows))
+            if self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Drop the least recently used entries beyond max_entries"""
+        excess = self.conn.execute('SELECT COUNT(*) FROM elevations').fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._write(lambda: self.conn.execute(
+                'DELETE FROM elevations WHERE (lat, lon) IN '
+                '(SELECT lat, lon FROM elevations ORDER BY last_used LIMIT ?)', (excess,)))
+
+    def _write(self, operation):
+        """Run operation inside a single write transaction"""
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            operation()
+        except:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM elevations').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
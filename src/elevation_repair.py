@@ -0,0 +1,105 @@
+import numpy as np
+
+DEFAULT_MAX_GRADE = 40.0
+DEFAULT_SMOOTHING_WINDOW = 25.0
+
+# Grades over shorter steps are measured over this run so GPS jitter doesn't look like a cliff
+MIN_RUN_M = 5.0
+
+SMOOTHING_METHODS = ('median', 'savgol')
+
+def find_spikes(distances, elevations, max_grade=DEFAULT_MAX_GRADE):
+    """Flag points whose grade in and out both exceed max_grade in opposite directions
+
+    distances are in meters, NaN elevations are ignored. Returns a boolean mask.
+    """
+    spikes = np.zeros(len(elevations), dtype=bool)
+    valid = np.flatnonzero(~np.isnan(elevations))
+    if len(valid) < 3:
+        return spikes
+
+    rise = np.diff(elevations[valid])
+    run = np.maximum(np.diff(distances[valid]), MIN_RUN_M)
+    grades = rise / run * 100
+    steep_in = np.abs(grades[:-1]) > max_grade
+    steep_out = np.abs(grades[1:]) > max_grade
+    reverses = np.sign(grades[:-1]) != np.sign(grades[1:])
+    spikes[valid[1:-1]] = steep_in & steep_out & reverses
+    return spikes
+
+def fill_gaps(distances, elevations):
+    """Linearly interpolate NaN elevations along distance, ends take the nearest value"""
+    missing = np.isnan(elevations)
+    if not missing.any() or missing.all():
+        return elevations
+    filled = elevations.copy()
+    filled[missing] = np.interp(distances[missing], distances[~missing], elevations[~missing])
+    return filled
+
+def _resample(distances, elevations):
+    """Resample onto an evenly spaced distance grid, Returns (grid, values, spacing)"""
+    steps = np.diff(distances)
+    steps = steps[steps > 0]
+    spacing = max(float(np.median(steps)) if len(steps) else 1.0, 0.5)
+    grid = np.arange(distances[0], distances[-1] + spacing, spacing)
+    return grid, np.interp(grid, distances, elevations), spacing
+
+def _savgol_coefficients(half_width, order=2):
+    """Savitzky-Golay smoothing weights for a centred window of 2 * half_width + 1 samples"""
+    x = np.arange(-half_width, half_width + 1)
+    return np.linalg.pinv(np.vander(x, order + 1, increasing=True))[0]
+
+def smooth(distances, elevations, method='median', window=DEFAULT_SMOOTHING_WINDOW):
+    """Distance-weighted smoothing over a window in meters
+
+    Elevations are resampled to an even distance grid first, so the window covers the same
+    ground whether the device recorded every second or every few meters.
+    """
+    if len(elevations) < 3 or distances[-1] <= distances[0]:
+        return elevations
+
+    grid, values, spacing = _resample(distances, elevations)
+    half_width = int(window / spacing / 2)
+    if half_width < 1 or len(grid) < 2 * half_width + 1:
+        return elevations
+
+    padded = np.pad(values, half_width, mode='edge')
+    if method == 'median':
+        windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * half_width + 1)
+        smoothed = np.median(windows, axis=1)
+    elif method == 'savgol':
+        smoothed = np.convolve(padded, _savgol_coefficients(half_width)[::-1], mode='valid')
+    else:
+        raise ValueError(f"Unknown smoothing method: {method}")
+    return np.interp(distances, grid, smoothed)
+
+def repair_elevations(distances, elevations, max_grade=DEFAULT_MAX_GRADE, smoothing=None,
+                      window=DEFAULT_SMOOTHING_WINDOW):
+    """Reject spikes, fill gaps and optionally smooth one segment
+
+    distances are cumulative kilometers as returned by track_metrics.cumulative_distance,
+    NaN elevations mark points the source had no value for. A segment without any valid
+    elevation is returned unchanged. Returns (elevations, counts) where counts holds how
+    many points were filled, rejected as outliers and changed by smoothing.
+    """
+    distances = np.asarray(distances, dtype=float) * 1000
+    elevations = np.asarray(elevations, dtype=float)
+    counts = {'filled': 0, 'outliers': 0, 'smoothed': 0}
+    if np.isnan(elevations).all():
+        return elevations, counts
+
+    repaired = elevations.copy()
+    if max_grade:
+        spikes = find_spikes(distances, repaired, max_grade)
+        repaired[spikes] = np.nan
+        counts['outliers'] = int(np.count_nonzero(spikes))
+
+    counts['filled'] = int(np.count_nonzero(np.isnan(elevations)))
+    repaired = fill_gaps(distances, repaired)
+
+    if smoothing:
+        before = repaired
+        repaired = smooth(distances, repaired, smoothing, window)
+        counts['smoothed'] = int(np.count_nonzero(np.abs(repaired - before) > 0.01))
+
+    return repaired, counts
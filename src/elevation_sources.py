@@ -1,19 +1,42 @@
 from abc import ABC, abstractmethod
-import requests
-import rasterio
-from rasterio.io import MemoryFile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 import numpy as np
-import json
+import glob
+import math
 import os
+from elevation_cache import QUANTIZATION, SQLiteElevationCache, quantize
 
 class ElevationSource(ABC):
     """Abstract base class for elevation data sources"""
 
+    # Remote sources are worth prefetching across files before a batch run
+    remote = False
+
     @abstractmethod
     def get_elevation(self, latitude, longitude):
         """Get elevation at given coordinates, Returns elevation in meters"""
         pass
 
+    def get_elevations(self, coords):
+        """Get elevations for a sequence of (latitude, longitude) pairs, Returns a list aligned with coords"""
+        return [self.get_elevation(latitude, longitude) for latitude, longitude in coords]
+
+    def get_elevations_array(self, latitudes, longitudes):
+        """Vectorized lookup of lat/lon arrays, Returns a float array with NaN where no elevation is available"""
+        elevations = self.get_elevations(zip(latitudes, longitudes))
+        return np.array([np.nan if e is None else e for e in elevations], dtype=float)
+
+    def prefetch(self, latitudes, longitudes):
+        """Warm up whatever later lookups of these coordinates will need"""
+        pass
+
+    def get_stats(self):
+        """Cumulative counters for profiling, e.g. cache hits and fetches"""
+        return {}
+
     @abstractmethod
     def get_name(self):
         """Return the name of this elevation source"""
@@ -21,46 +44,296 @@ class ElevationSource(ABC):
 
 class SRTMSource(ElevationSource):
     def __init__(self):
-        import srtm 
-        self.elevation_data = srtm.get_data()
+        self._elevation_data = None
+
+    @property
+    def elevation_data(self):
+        """Load the SRTM index on first lookup rather than at construction"""
+        if self._elevation_data is None:
+            import srtm
+            self._elevation_data = srtm.get_data()
+        return self._elevation_data
 
     def get_elevation(self, latitude, longitude):
         return self.elevation_data.get_elevation(latitude, longitude)
+
+    def prefetch(self, latitudes, longitudes):
+        """Load (downloading if needed) every 1 degree tile the coordinates fall in"""
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        if latitudes.size == 0:
+            return
+        cells = np.unique(np.column_stack((np.floor(latitudes), np.floor(longitudes))), axis=0)
+        for latitude, longitude in cells:
+            self.elevation_data.get_file(latitude + 0.5, longitude + 0.5)
     
     def get_name(self):
         return "SRTM"
     
-class USGSPointQuerySource(ElevationSource):
-    def __init__(self, cache_file='data/cache/usgs_cache.json'):
-        self.base_url = "https://epqs.nationalmap.gov/v1/json"
-        self.cache_file = cache_file
-        self.cache = self._load_cache()
-
-    def _load_cache(self):
-        """Load cache from disk if it exists"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r') as f:
-                    print(f"Loaded {len(json.load(f))} cached elevations")
-                    f.seek(0)
-                    return json.load(f)
-            except:
-                pass
-
-        # Create cache directory if it doesn't exist
-        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
-        return {}
-    
-    def _save_cache(self):
-        """Save cache to disk"""
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.cache, f)
+class DEMSource(ElevationSource):
+    """Samples local GeoTIFF / SRTM HGT tiles with bilinear interpolation, no network needed"""
+
+    # Tiles are read in square blocks of this many pixels so memory stays bounded
+    BLOCK_SIZE = 1024
+    # Most recently used blocks kept in memory (float32, ~4MB each)
+    CACHED_BLOCKS = 32
+    TILE_PATTERNS = ('*.tif', '*.tiff', '*.hgt')
+
+    def __init__(self, path='data/dem'):
+        import rasterio
+        from rasterio.warp import transform_bounds
+
+        self.paths = self._find_tiles(path)
+        if not self.paths:
+            raise FileNotFoundError(f"No DEM tiles found in {path}")
+
+        # Only tile metadata is read up front, pixels are loaded on demand
+        self.tiles = []
+        for tile_path in self.paths:
+            with rasterio.open(tile_path) as src:
+                geographic = src.crs is None or src.crs.to_epsg() == 4326
+                bounds = src.bounds if geographic else transform_bounds(src.crs, 'EPSG:4326', *src.bounds)
+                self.tiles.append({
+                    'path': tile_path,
+                    'crs': None if geographic else src.crs,
+                    'bounds': bounds,
+                    'transform': src.transform,
+                    'nodata': src.nodata,
+                    'width': src.width,
+                    'height': src.height,
+                })
+        self._datasets = {}
+        self._blocks = OrderedDict()
+        self.stats = {'blocks_read': 0}
+
+    def _find_tiles(self, path):
+        if os.path.isdir(path):
+            return sorted(tile for pattern in self.TILE_PATTERNS
+                          for tile in glob.glob(os.path.join(path, '**', pattern), recursive=True))
+        return [path] if os.path.exists(path) else []
+
+    def _open(self, tile):
+        """Keep each tile open once it has been touched"""
+        if tile['path'] not in self._datasets:
+            import rasterio
+            self._datasets[tile['path']] = rasterio.open(tile['path'])
+        return self._datasets[tile['path']]
+
+    def get_elevations_array(self, latitudes, longitudes):
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        elevations = np.full(latitudes.shape, np.nan)
+        if latitudes.size == 0:
+            return elevations
+
+        for tile, inside in self._tiles_for(latitudes, longitudes):
+            inside &= np.isnan(elevations)
+            if not inside.any():
+                continue
+            xs, ys = self._to_tile_crs(tile, longitudes[inside], latitudes[inside])
+            elevations[inside] = self._sample_tile(tile, xs, ys)
+        return elevations
+
+    def _pixel_coords(self, tile, xs, ys):
+        """Fractional pixel coordinates in the tile's own CRS, Returns (rows, cols, on_raster)
+
+        Points within half a pixel of the raster edge are clamped onto the edge pixels.
+        Anything further out, e.g. inside the looser geographic bounds of a projected
+        tile, is flagged off the raster so another tile or tier can answer it.
+        """
+        inverse = ~tile['transform']
+        # Measured from the centre of the first pixel
+        cols = inverse.a * xs + inverse.b * ys + inverse.c - 0.5
+        rows = inverse.d * xs + inverse.e * ys + inverse.f - 0.5
+        on_raster = ((rows >= -0.5) & (rows <= tile['height'] - 0.5) &
+                     (cols >= -0.5) & (cols <= tile['width'] - 0.5))
+        return np.clip(rows, 0, tile['height'] - 1), np.clip(cols, 0, tile['width'] - 1), on_raster
+
+    def _block(self, tile, block_row, block_col):
+        """Return one block padded by an edge row and column, read from disk only once it drops out of the cache"""
+        from rasterio.windows import Window
+
+        key = (tile['path'], block_row, block_col)
+        if key in self._blocks:
+            self._blocks.move_to_end(key)
+            return self._blocks[key]
+
+        row_off = block_row * self.BLOCK_SIZE
+        col_off = block_col * self.BLOCK_SIZE
+        # One extra row and column so every point has all four neighbours
+        height = min(self.BLOCK_SIZE + 1, tile['height'] - row_off)
+        width = min(self.BLOCK_SIZE + 1, tile['width'] - col_off)
+        data = self._open(tile).read(1, window=Window(col_off, row_off, width, height)).astype(np.float32)
+        self.stats['blocks_read'] += 1
+        if tile['nodata'] is not None:
+            data[data == tile['nodata']] = np.nan
+        data = np.pad(data, ((0, 1), (0, 1)), mode='edge')
+
+        self._blocks[key] = data
+        if len(self._blocks) > self.CACHED_BLOCKS:
+            self._blocks.popitem(last=False)
+        return data
+
+    def _tiles_for(self, latitudes, longitudes):
+        """Yield (tile, mask) for every tile holding some of the points, skipping tiles outside their bounding box"""
+        min_lon, max_lon = np.nanmin(longitudes), np.nanmax(longitudes)
+        min_lat, max_lat = np.nanmin(latitudes), np.nanmax(latitudes)
+        for tile in self.tiles:
+            left, bottom, right, top = tile['bounds']
+            if left > max_lon or right < min_lon or bottom > max_lat or top < min_lat:
+                continue
+            inside = ((longitudes >= left) & (longitudes <= right) &
+                      (latitudes >= bottom) & (latitudes <= top))
+            if inside.any():
+                yield tile, inside
+
+    def _to_tile_crs(self, tile, xs, ys):
+        from rasterio.warp import transform
+
+        if tile['crs'] is None:
+            return xs, ys
+        return (np.asarray(values) for values in transform('EPSG:4326', tile['crs'], xs, ys))
+
+    def _sample_tile(self, tile, xs, ys):
+        """Bilinear interpolation of one tile at the given coordinates in its own CRS"""
+        rows, cols, on_raster = self._pixel_coords(tile, xs, ys)
+        elevations = np.full(xs.shape, np.nan)
+        block_rows = (rows // self.BLOCK_SIZE).astype(np.int64)
+        block_cols = (cols // self.BLOCK_SIZE).astype(np.int64)
+        blocks = block_rows * (tile['width'] // self.BLOCK_SIZE + 1) + block_cols
+        # Off-raster points keep NaN
+        blocks[~on_raster] = -1
+
+        for block in np.unique(blocks[on_raster]):
+            selected = blocks == block
+            block_row = int(block_rows[selected][0])
+            block_col = int(block_cols[selected][0])
+            data = self._block(tile, block_row, block_col)
+
+            r = rows[selected] - block_row * self.BLOCK_SIZE
+            c = cols[selected] - block_col * self.BLOCK_SIZE
+            r0 = np.floor(r).astype(np.int64)
+            c0 = np.floor(c).astype(np.int64)
+            fr = r - r0
+            fc = c - c0
+            values = ((1 - fr) * (1 - fc) * data[r0, c0] + (1 - fr) * fc * data[r0, c0 + 1] +
+                      fr * (1 - fc) * data[r0 + 1, c0] + fr * fc * data[r0 + 1, c0 + 1])
+
+            # Next to a void, fall back to the nearest pixel rather than dropping the point
+            voids = np.isnan(values)
+            if voids.any():
+                values[voids] = data[np.rint(r[voids]).astype(np.int64), np.rint(c[voids]).astype(np.int64)]
+            elevations[selected] = values
+        return elevations
+
+    def prefetch(self, latitudes, longitudes):
+        """Read the blocks these coordinates fall in, as far as the block cache holds them"""
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        if latitudes.size == 0:
+            return
+
+        needed = []
+        for tile, inside in self._tiles_for(latitudes, longitudes):
+            xs, ys = self._to_tile_crs(tile, longitudes[inside], latitudes[inside])
+            rows, cols, on_raster = self._pixel_coords(tile, xs, ys)
+            rows, cols = rows[on_raster], cols[on_raster]
+            blocks = np.unique(np.column_stack((rows // self.BLOCK_SIZE, cols // self.BLOCK_SIZE)), axis=0)
+            needed.extend((tile, int(block_row), int(block_col)) for block_row, block_col in blocks)
+
+        # Blocks that would evict each other are left to be read on demand
+        for tile, block_row, block_col in needed[:self.CACHED_BLOCKS]:
+            self._block(tile, block_row, block_col)
 
     def get_elevation(self, latitude, longitude):
-        cache_key = f"{latitude:.6f},{longitude:.6f}"
-        if cache_key in self.cache:
-            return self.cache[cache_key]
-        
+        elevation = self.get_elevations_array([latitude], [longitude])[0]
+        return None if np.isnan(elevation) else float(elevation)
+
+    def get_elevations(self, coords):
+        coords = np.array(list(coords), dtype=float).reshape(-1, 2)
+        elevations = self.get_elevations_array(coords[:, 0], coords[:, 1])
+        return [None if math.isnan(e) else e for e in elevations.tolist()]
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def get_name(self):
+        return f"Local DEM ({len(self.paths)} tiles)"
+
+class USGSPointQuerySource(ElevationSource):
+    remote = True
+
+    # Responses worth retrying: rate limiting and transient server errors
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    # New elevations are committed to the cache in batches of this size
+    COMMIT_BATCH_SIZE = 500
+
+    def __init__(self, cache=None,
+                 base_url="https://epqs.nationalmap.gov/v1/json",
+                 max_workers=8, max_retries=3, backoff=0.5,
+                 requests_per_second=None, timeout=10):
+        self.base_url = base_url
+        if cache is None:
+            cache = SQLiteElevationCache(legacy_json='data/cache/usgs_cache.json')
+        self.cache = cache
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.requests_per_second = requests_per_second
+        self.timeout = timeout
+        self.session = self._create_session()
+
+        # Shared across worker threads so the whole pool respects the rate limit
+        self._rate_lock = threading.Lock()
+        self._next_request_time = 0.0
+
+        self._stats_lock = threading.Lock()
+        self.stats = {'cache_hits': 0, 'cache_misses': 0, 'fetches': 0, 'fetch_errors': 0,
+                      'cache_seconds': 0.0}
+
+    def _create_session(self):
+        """Create a keep-alive session with one pooled connection per worker"""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _wait_for_rate_limit(self):
+        """Block until this thread may send its next request"""
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request_time - now
+            interval = 1.0 / self.requests_per_second if self.requests_per_second else 0.0
+            self._next_request_time = max(now, self._next_request_time) + interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def _defer_requests(self, delay):
+        """Hold back every worker for delay seconds, e.g. after a 429"""
+        with self._rate_lock:
+            self._next_request_time = max(self._next_request_time, time.monotonic() + delay)
+
+    @staticmethod
+    def _parse_elevation(data):
+        """Extract a valid elevation from a service response, Returns None if invalid"""
+        # API returns elevation in "value" field
+        if 'value' in data:
+            elevation = float(data['value'])
+            # Check for invalid values
+            if elevation == -1000000 or elevation < -500 or elevation > 9000:
+                return None
+            return elevation
+        return None
+
+    def _fetch_elevation(self, latitude, longitude):
+        """Query the service for one point, retrying with exponential backoff"""
+        import requests
+
         params = {
             'x': longitude,
             'y': latitude,
@@ -68,27 +341,231 @@ class USGSPointQuerySource(ElevationSource):
             'wkid': 4326,
             'includeDate': 'false'
         }
-        
-        try:
-            response = requests.get(self.base_url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # API returns elevation in "value" field
-            if 'value' in data:
-                elevation = float(data['value'])
-                # Check for invalid values
-                if elevation == -1000000 or elevation < -500 or elevation > 9000:
-                    return None
-                self.cache[cache_key] = elevation
-                self._save_cache()
-                return elevation
-            return None
-            
-        except Exception as e:
-            print(f"Error: {e}")
-            return None
-    
+
+        error = None
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_rate_limit()
+            self._count('fetches')
+            delay = self.backoff * (2 ** attempt)
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+                if response.status_code in self.RETRY_STATUS_CODES:
+                    retry_after = response.headers.get('Retry-After', '')
+                    if retry_after.isdigit():
+                        delay = max(delay, float(retry_after))
+                    if response.status_code == 429:
+                        self._defer_requests(delay)
+                        delay = 0
+                    error = f"HTTP {response.status_code} from {self.base_url}"
+                else:
+                    response.raise_for_status()
+                    return self._parse_elevation(response.json())
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except Exception as e:
+                print(f"Error: {e}")
+                self._count('fetch_errors')
+                return None
+
+            if attempt < self.max_retries and delay > 0:
+                time.sleep(delay)
+
+        print(f"Error: {error}")
+        self._count('fetch_errors')
+        return None
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            self.stats[name] += value
+
+    def _cache_get(self, keys):
+        start = time.perf_counter()
+        found = self.cache.get_many(keys)
+        self._count('cache_seconds', time.perf_counter() - start)
+        return found
+
+    def _cache_put(self, elevations):
+        start = time.perf_counter()
+        self.cache.put_many(elevations)
+        self._count('cache_seconds', time.perf_counter() - start)
+
+    def get_elevation(self, latitude, longitude):
+        cache_key = quantize(latitude, longitude)
+        cached = self._cache_get([cache_key])
+        if cache_key in cached:
+            self._count('cache_hits')
+            return cached[cache_key]
+
+        self._count('cache_misses')
+        elevation = self._fetch_elevation(latitude, longitude)
+        if elevation is not None:
+            self._cache_put({cache_key: elevation})
+        return elevation
+
+    def get_elevations(self, coords):
+        """Fetch all uncached coordinates concurrently, committing to the cache in batches"""
+        coords = list(coords)
+        keys = [quantize(latitude, longitude) for latitude, longitude in coords]
+        elevations = self._cache_get(keys)
+
+        # Dedupe and skip anything already cached
+        misses = {}
+        for key, coord in zip(keys, coords):
+            if key not in elevations and key not in misses:
+                misses[key] = coord
+        self._count('cache_hits', len(elevations))
+        self._count('cache_misses', len(misses))
+
+        if misses:
+            print(f"Fetching {len(misses)} elevations from {self.get_name()} "
+                  f"({len(keys) - len(misses)} cached or duplicate)")
+            pending = {}
+            try:
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    fetched = executor.map(lambda coord: self._fetch_elevation(*coord), misses.values())
+                    for key, elevation in zip(misses, fetched):
+                        if elevation is None:
+                            continue
+                        elevations[key] = elevation
+                        pending[key] = elevation
+                        if len(pending) >= self.COMMIT_BATCH_SIZE:
+                            self._cache_put(pending)
+                            pending = {}
+            finally:
+                self._cache_put(pending)
+
+        return [elevations.get(key) for key in keys]
+
+    def prefetch(self, latitudes, longitudes):
+        """Fetch every uncached coordinate into the persistent cache"""
+        self.get_elevations(zip(latitudes, longitudes))
+
+    def get_stats(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+    def get_name(self):
+        return "USGS Point Query Service"
+
+class TieredElevationSource(ElevationSource):
+    """Resolves each point from the cheapest tier that has it
+
+    Tiers are tried in order: an in-memory LRU, the persistent cache, then each of
+    sources, a list of (name, source) pairs such as a local DEM, SRTM and finally
+    USGS. Only the points a tier could not answer move on to the next, deduped at
+    cache precision. Each local tier is prefetched for the points still unresolved
+    just before it is queried, so per-point lookups don't stall on tile reads.
+
+    Local values only stay in memory, the persistent cache holds what the remote
+    sources store there. last_tiers names the tier that answered each point of the
+    latest lookup ('memory', 'cache', a source name, or 'none' if no tier had it),
+    and the from_<tier> counters add up to the number of points looked up. A tier
+    that raises is reported and skipped, its points fall through to the next one.
+    """
+
+    MEMORY_SIZE = 250000
+
+    def __init__(self, sources, cache=None, memory_size=MEMORY_SIZE):
+        self.sources = list(sources)
+        self.cache = cache
+        self.memory_size = memory_size
+        self.memory = OrderedDict()
+        self.remote = any(source.remote for _, source in self.sources)
+
+        self.tier_names = ['memory', 'cache'] + [name for name, _ in self.sources] + ['none']
+        self.last_tiers = np.empty(0, dtype=str)
+        self.stats = {'prefetch_seconds': 0.0, 'tier_errors': 0}
+        self.stats.update((f"from_{name}", 0) for name in self.tier_names)
+
+    def _remember(self, key, elevation):
+        self.memory[key] = elevation
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def get_elevations_array(self, latitudes, longitudes):
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        elevations = np.full(latitudes.shape, np.nan)
+        tiers = np.full(latitudes.shape, -1, dtype=np.int64)
+        keys = np.column_stack((np.round(latitudes * QUANTIZATION),
+                                np.round(longitudes * QUANTIZATION))).astype(np.int64)
+
+        for i, key in enumerate(map(tuple, keys.tolist())):
+            remembered = self.memory.get(key)
+            if remembered is not None:
+                self.memory.move_to_end(key)
+                elevations[i], tiers[i] = remembered, 0
+
+        missing = np.flatnonzero(tiers < 0)
+        if missing.size:
+            pending, first, inverse = np.unique(keys[missing], axis=0, return_index=True, return_inverse=True)
+            pending = list(map(tuple, pending.tolist()))
+            pending_lats = latitudes[missing][first]
+            pending_lons = longitudes[missing][first]
+            values = np.full(len(pending), np.nan)
+            origins = np.full(len(pending), -1, dtype=np.int64)
+
+            if self.cache is not None:
+                cached = self.cache.get_many(pending)
+                for j, key in enumerate(pending):
+                    if key in cached:
+                        values[j], origins[j] = cached[key], 1
+
+            for tier, (name, source) in enumerate(self.sources, 2):
+                todo = np.flatnonzero(origins < 0)
+                if not todo.size:
+                    break
+                try:
+                    if not source.remote:
+                        start = time.perf_counter()
+                        source.prefetch(pending_lats[todo], pending_lons[todo])
+                        self.stats['prefetch_seconds'] += time.perf_counter() - start
+                    found = np.asarray(source.get_elevations_array(pending_lats[todo], pending_lons[todo]),
+                                       dtype=float)
+                except Exception as e:
+                    # A tier that can't answer (offline, unreadable tile) just passes its points on
+                    print(f"Error: {name} tier failed, trying the next one: {e}")
+                    self.stats['tier_errors'] += 1
+                    continue
+                hit = ~np.isnan(found)
+                values[todo[hit]] = found[hit]
+                origins[todo[hit]] = tier
+
+            for key, value, origin in zip(pending, values.tolist(), origins.tolist()):
+                if origin >= 0:
+                    self._remember(key, value)
+            inverse = inverse.reshape(-1)
+            elevations[missing] = values[inverse]
+            tiers[missing] = origins[inverse]
+
+        self.last_tiers = np.array(self.tier_names)[tiers]
+        names, counts = np.unique(self.last_tiers, return_counts=True)
+        for name, count in zip(names.tolist(), counts.tolist()):
+            self.stats[f"from_{name}"] += count
+        if len(latitudes):
+            print("Resolved elevations by tier: " +
+                  ", ".join(f"{name} {count}" for name, count in zip(names.tolist(), counts.tolist())))
+        return elevations
+
+    def get_elevation(self, latitude, longitude):
+        elevation = self.get_elevations_array([latitude], [longitude])[0]
+        return None if np.isnan(elevation) else float(elevation)
+
+    def get_elevations(self, coords):
+        coords = np.array(list(coords), dtype=float).reshape(-1, 2)
+        elevations = self.get_elevations_array(coords[:, 0], coords[:, 1])
+        return [None if math.isnan(e) else e for e in elevations.tolist()]
+
+    def prefetch(self, latitudes, longitudes):
+        """Resolve every coordinate through the tiers into memory, remote values also land in the persistent cache"""
+        self.get_elevations_array(latitudes, longitudes)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        for name, source in self.sources:
+            stats.update((f"{name}_{key}", value) for key, value in source.get_stats().items())
+        return stats
+
     def get_name(self):
-        return "USGS Point Query Service"
\ No newline at end of file
+        return "Tiered (" + " -> ".join(['memory', 'cache'] + [source.get_name() for _, source in self.sources]) + ")"
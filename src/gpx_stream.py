@@ -0,0 +1,241 @@
+import math
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
+import numpy as np
+from profiling import StageProfiler
+from track_metrics import GainLossAccumulator
+
+DEFAULT_CHUNK_SIZE = 10000
+
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+class StreamingCorrector:
+    """Corrects <trkpt> elevations of a GPX file with bounded memory
+
+    The input is read with iterparse and every event is echoed to the output, so the rest
+    of the document (metadata, waypoints, extensions, comments, whitespace) is kept as is.
+    Track points are buffered until chunk_size of them are pending, corrected through the
+    elevation source's bulk lookup and written out. Elements are dropped from the tree as
+    soon as they have been written.
+    """
+
+    def __init__(self, elevation_source, chunk_size=DEFAULT_CHUNK_SIZE, gain_threshold=0.0, profiler=None):
+        self.elevation_source = elevation_source
+        self.chunk_size = chunk_size
+        self.gain_threshold = gain_threshold
+        self.profiler = profiler or StageProfiler()
+
+    def process(self, input_path, output_path):
+        """Correct input_path into output_path, Returns summary statistics"""
+        self.prefixes = {'http://www.w3.org/XML/1998/namespace': 'xml'}
+        self.qnames = {}
+        self.pending_namespaces = []
+        self.declarations = {}
+        self.pieces = []
+        self.points = []
+        self.segment_index = -1
+        self.stats = {
+            'points': 0,
+            'corrected': 0,
+            'change_total': 0.0,
+            'change_count': 0,
+            'large_changes': 0,
+            'original_gain': 0.0,
+            'original_loss': 0.0,
+            'corrected_gain': 0.0,
+            'corrected_loss': 0.0,
+        }
+        # Gain/loss state of the current segment carries across chunk boundaries
+        self.accumulators = None
+        self.accumulator_segment = None
+
+        parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True, insert_pis=True))
+        events = ET.iterparse(input_path, events=('start', 'end', 'start-ns', 'comment', 'pi'),
+                              parser=parser)
+
+        with open(output_path, 'w', encoding='utf-8') as self.output:
+            self.output.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            stack = []
+            point = None
+            # The element whose text (after a start) or tail (after an end) comes next
+            last_event, last_element = None, None
+
+            for event, element in events:
+                if event == 'start-ns':
+                    prefix, uri = element
+                    self.prefixes[uri] = prefix
+                    self.qnames = {}
+                    self.pending_namespaces.append(element)
+                    continue
+
+                if point is None and last_element is not None:
+                    if last_event == 'start':
+                        self._write(escape(last_element.text or ''))
+                    else:
+                        self._write(escape(last_element.tail or ''))
+                        if stack:
+                            stack[-1].remove(last_element)
+
+                if event == 'start':
+                    self.declarations[element] = self.pending_namespaces
+                    self.pending_namespaces = []
+                    stack.append(element)
+                    if point is not None:
+                        continue
+                    if _local_name(element.tag) == 'trkseg':
+                        self.segment_index += 1
+                    if _local_name(element.tag) == 'trkpt':
+                        point = element
+                    else:
+                        self._write(self._start_tag(element))
+                elif event == 'end':
+                    stack.pop()
+                    if element is point:
+                        self._add_point(point)
+                        point = None
+                    elif point is not None:
+                        continue
+                    else:
+                        self._write(f"</{self._qname(element.tag)}>")
+                        self.declarations.pop(element, None)
+                else:
+                    if point is not None:
+                        continue
+                    self._write(self._serialize(element))
+                    # Comments and PIs are not on the stack, their tail follows like an end
+                    event = 'end'
+                last_event, last_element = event, element
+
+            self._flush()
+        self._close_segment()
+        return self.stats
+
+    def _write(self, text):
+        """Write straight through unless track points are waiting to be corrected"""
+        if not text:
+            return
+        if self.points:
+            self.pieces.append(text)
+        else:
+            self.output.write(text)
+
+    def _add_point(self, point):
+        self.pieces.append(point)
+        self.points.append((point, self.segment_index))
+        if len(self.points) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        """Correct the buffered chunk of points and write everything pending"""
+        if self.points:
+            self._correct_chunk()
+            self.profiler.count('chunks')
+        with self.profiler.stage('write'):
+            for piece in self.pieces:
+                self.output.write(piece if isinstance(piece, str) else self._serialize(piece))
+        self.pieces = []
+        self.points = []
+
+    def _correct_chunk(self):
+        count = len(self.points)
+        latitudes = np.empty(count)
+        longitudes = np.empty(count)
+        originals = np.full(count, np.nan)
+        segments = np.empty(count, dtype=np.int64)
+        ele_elements = []
+
+        for i, (point, segment) in enumerate(self.points):
+            latitudes[i] = float(point.get('lat'))
+            longitudes[i] = float(point.get('lon'))
+            segments[i] = segment
+            # Comments and PIs inside a trkpt have a function, not a string, as their tag
+            ele = next((child for child in point
+                        if isinstance(child.tag, str) and _local_name(child.tag) == 'ele'), None)
+            if ele is not None and ele.text and ele.text.strip():
+                originals[i] = float(ele.text)
+            ele_elements.append(ele)
+
+        with self.profiler.stage('lookup'):
+            corrected = self.elevation_source.get_elevations_array(latitudes, longitudes)
+
+        for i, (point, _) in enumerate(self.points):
+            if math.isnan(corrected[i]):
+                continue
+            ele = ele_elements[i]
+            if ele is None:
+                # Same namespace as the trkpt, <ele> is the first child in the GPX schema
+                namespace = point.tag[:-len(_local_name(point.tag))]
+                ele = ET.Element(namespace + 'ele')
+                point.insert(0, ele)
+            ele.text = f"{corrected[i]:.3f}"
+
+        final = np.where(np.isnan(corrected), originals, corrected)
+        changes = np.abs(final - originals)
+        changes = changes[~np.isnan(changes)]
+        self.stats['points'] += count
+        self.stats['corrected'] += int(np.count_nonzero(~np.isnan(corrected)))
+        self.stats['change_total'] += float(changes.sum())
+        self.stats['change_count'] += len(changes)
+        self.stats['large_changes'] += int(np.count_nonzero(changes > 5))
+
+        # Feed each run of same-segment points to that segment's accumulators
+        boundaries = np.flatnonzero(np.diff(segments)) + 1
+        for run in np.split(np.arange(count), boundaries):
+            if segments[run[0]] != self.accumulator_segment:
+                self._close_segment()
+                self.accumulator_segment = segments[run[0]]
+                self.accumulators = {name: GainLossAccumulator(self.gain_threshold)
+                                     for name in ('original', 'corrected')}
+            self.accumulators['original'].add(originals[run])
+            self.accumulators['corrected'].add(final[run])
+
+    def _close_segment(self):
+        """Add the finished segment's gain/loss to the totals"""
+        if self.accumulators is None:
+            return
+        for name, accumulator in self.accumulators.items():
+            gain, loss = accumulator.totals()
+            self.stats[f'{name}_gain'] += gain
+            self.stats[f'{name}_loss'] += loss
+        self.accumulators = None
+
+    def _qname(self, tag):
+        qname = self.qnames.get(tag)
+        if qname is None:
+            qname = tag
+            if tag.startswith('{'):
+                uri, local = tag[1:].split('}', 1)
+                prefix = self.prefixes.get(uri, '')
+                qname = f"{prefix}:{local}" if prefix else local
+            self.qnames[tag] = qname
+        return qname
+
+    def _start_tag(self, element):
+        parts = [self._qname(element.tag)]
+        for prefix, uri in self.declarations.get(element, ()):
+            parts.append(f"xmlns:{prefix}={quoteattr(uri)}" if prefix else f"xmlns={quoteattr(uri)}")
+        for name, value in element.attrib.items():
+            parts.append(f"{self._qname(name)}={quoteattr(value)}")
+        return f"<{' '.join(parts)}>"
+
+    def _serialize(self, element):
+        """Serialize a buffered subtree, excluding its tail"""
+        if element.tag == ET.Comment:
+            return f"<!--{element.text}-->"
+        if element.tag == ET.ProcessingInstruction:
+            return f"<?{element.text}?>"
+
+        parts = [self._start_tag(element), escape(element.text or '')]
+        for child in element:
+            parts.append(self._serialize(child))
+            parts.append(escape(child.tail or ''))
+        parts.append(f"</{self._qname(element.tag)}>")
+        self.declarations.pop(element, None)
+        return ''.join(parts)
+
+def stream_correct_gpx(input_path, output_path, elevation_source, chunk_size=DEFAULT_CHUNK_SIZE,
+                       gain_threshold=0.0, profiler=None):
+    """Correct a GPX file of any size without loading it into memory"""
+    corrector = StreamingCorrector(elevation_source, chunk_size, gain_threshold, profiler)
+    return corrector.process(input_path, output_path)
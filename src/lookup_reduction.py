@@ -0,0 +1,111 @@
+import numpy as np
+
+# Meters per degree of latitude, close enough for grid sizes and simplification tolerances
+METERS_PER_DEGREE = 111320.0
+
+# 1/3 arc-second, the native resolution of USGS 3DEP (~10m)
+DEFAULT_GRID_M = METERS_PER_DEGREE / 3 / 3600
+
+def simplify(latitudes, longitudes, tolerance):
+    """Douglas-Peucker simplification, Returns a mask of the points to keep
+
+    tolerance is in meters, measured on a local equirectangular projection. Both end
+    points are always kept. Each split is a single vectorized distance computation.
+    """
+    count = len(latitudes)
+    keep = np.zeros(count, dtype=bool)
+    if count == 0:
+        return keep
+    keep[[0, -1]] = True
+    if count < 3:
+        return keep
+
+    scale = np.cos(np.radians(np.mean(latitudes)))
+    x = (np.asarray(longitudes) - longitudes[0]) * METERS_PER_DEGREE * scale
+    y = (np.asarray(latitudes) - latitudes[0]) * METERS_PER_DEGREE
+
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        length = np.hypot(dx, dy)
+        if length > 0:
+            distances = np.abs(px * dy - py * dx) / length
+        else:
+            distances = np.hypot(px, py)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+class LookupPlan:
+    """Reduces a track's points to the smallest set of elevation lookups
+
+    Points are optionally thinned with Douglas-Peucker, then snapped to a grid of
+    grid meters (default: the 3DEP native resolution) and only one query is made per
+    occupied cell, at its centre. expand() maps the query results back onto every
+    point, interpolating along distance for points dropped by simplification.
+    """
+
+    def __init__(self, latitudes, longitudes, segment_offsets, grid=DEFAULT_GRID_M, simplify_tolerance=None):
+        self.segment_offsets = segment_offsets
+        self.point_count = len(latitudes)
+
+        if simplify_tolerance:
+            self.sampled = np.zeros(self.point_count, dtype=bool)
+            for start, stop in zip(segment_offsets[:-1], segment_offsets[1:]):
+                self.sampled[start:stop] = simplify(latitudes[start:stop], longitudes[start:stop],
+                                                    simplify_tolerance)
+        else:
+            self.sampled = np.ones(self.point_count, dtype=bool)
+
+        sampled_lats = latitudes[self.sampled]
+        sampled_lons = longitudes[self.sampled]
+        if grid:
+            cell = grid / METERS_PER_DEGREE
+            cells = np.column_stack((np.floor(sampled_lats / cell), np.floor(sampled_lons / cell)))
+            cells, self.inverse = np.unique(cells, axis=0, return_inverse=True)
+            self.inverse = self.inverse.reshape(-1)
+            self.latitudes = (cells[:, 0] + 0.5) * cell
+            self.longitudes = (cells[:, 1] + 0.5) * cell
+        else:
+            self.inverse = np.arange(len(sampled_lats))
+            self.latitudes = sampled_lats
+            self.longitudes = sampled_lons
+
+    @property
+    def query_count(self):
+        return len(self.latitudes)
+
+    @property
+    def reduction(self):
+        """Track points per lookup"""
+        return self.point_count / self.query_count if self.query_count else 1.0
+
+    def expand(self, elevations, distances):
+        """Map per-query elevations back to every track point
+
+        Points that were looked up take their cell's value, NaN included, so gaps are left
+        for the repair stage. Points skipped by simplification are interpolated along
+        distance from the nearest looked-up points of the same segment.
+        """
+        result = np.full(self.point_count, np.nan)
+        result[self.sampled] = np.asarray(elevations, dtype=float)[self.inverse]
+        if self.sampled.all():
+            return result
+
+        for start, stop in zip(self.segment_offsets[:-1], self.segment_offsets[1:]):
+            segment = result[start:stop]
+            known = self.sampled[start:stop] & ~np.isnan(segment)
+            skipped = ~self.sampled[start:stop]
+            if known.any() and skipped.any():
+                segment_distances = distances[start:stop]
+                segment[skipped] = np.interp(segment_distances[skipped], segment_distances[known],
+                                             segment[known])
+        return result
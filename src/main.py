@@ -1,91 +1,187 @@
+import os
 import gpxpy
-from elevation_sources import SRTMSource, USGSPointQuerySource
-from visualization import create_elevation_profile
+import numpy as np
+from elevation_cache import SQLiteElevationCache
+from elevation_sources import DEMSource, SRTMSource, TieredElevationSource, USGSPointQuerySource
+from elevation_repair import repair_elevations
+from gpx_stream import stream_correct_gpx
+from lookup_reduction import LookupPlan
+from manifest import read_segment_elevations
+from profiling import StageProfiler
+from track import Track
+from track_metrics import cumulative_distance, grade, segment_distances, track_gain_loss
 
-def process_gpx_file(input_path, output_path, args):
-    """Process a single GPX file with elevation corrections"""
+# Sources built so far, keyed on the process and the settings that shape them
+_elevation_sources = {}
 
-    # Choose elevation source based on args
+def create_elevation_source(args):
+    """Return the elevation source for args, built once per process and reused
+
+    The process id is part of the key, so a forked worker never picks up its parent's
+    source along with its SQLite connection, HTTP session and locks.
+    """
+    key = (os.getpid(), args.source, args.dem, args.cache, args.cache_max_entries, args.usgs_url,
+           args.workers, args.rate_limit, tuple(args.tiers))
+    if key not in _elevation_sources:
+        _elevation_sources[key] = _build_elevation_source(args)
+    return _elevation_sources[key]
+
+def _build_elevation_source(args):
+    """Choose elevation source based on args"""
     if args.source == 'srtm':
-        elevation_source = SRTMSource()
-    else:
-        elevation_source = USGSPointQuerySource()
+        return SRTMSource()
+    if args.source == 'dem':
+        return DEMSource(args.dem)
+
+    cache = SQLiteElevationCache(args.cache, max_entries=args.cache_max_entries,
+                                 legacy_json='data/cache/usgs_cache.json')
+    if args.source == 'tiered':
+        return TieredElevationSource(_build_tiers(args, cache), cache=cache)
+    return _build_usgs_source(args, cache)
+
+def _build_usgs_source(args, cache):
+    return USGSPointQuerySource(cache=cache,
+                                base_url=args.usgs_url,
+                                max_workers=args.workers,
+                                requests_per_second=args.rate_limit)
+
+def _build_tiers(args, cache):
+    """Build the (name, source) chain for --source tiered, USGS shares the persistent cache"""
+    tiers = []
+    for name in args.tiers:
+        if name == 'dem':
+            try:
+                tiers.append((name, DEMSource(args.dem)))
+            except FileNotFoundError as e:
+                print(f"Skipping DEM tier: {e}")
+        elif name == 'srtm':
+            tiers.append((name, SRTMSource()))
+        else:
+            tiers.append((name, _build_usgs_source(args, cache)))
+    return tiers
+
+def process_gpx_file(input_path, output_path, args, elevation_source=None, reuse=None):
+    """Process a single GPX file with elevation corrections, Returns its summary statistics
+
+    reuse is the {'output', 'segments'} plan from Manifest.plan() when the file was corrected
+    before, segments with the same points are then read back from that output instead.
+    """
+
+    if elevation_source is None:
+        elevation_source = create_elevation_source(args)
 
     if args.verbose:
         print(f"Using elevation source: {elevation_source.get_name()}")
 
-    def correct_elevation(point):
-        """Fetch correct elevation for a given point"""
-        return elevation_source.get_elevation(point.latitude, point.longitude)
-    
+    profiler = StageProfiler()
+    source_stats = elevation_source.get_stats()
+
+    if args.stream:
+        return process_gpx_stream(input_path, output_path, elevation_source, args, profiler)
+
     # Load and parse GPX file
-    with open('data/input/YoungDrive.gpx', 'r')  as gpx_file:
-        gpx = gpxpy.parse(gpx_file)
+    with profiler.stage('parse'):
+        with open(input_path, 'r') as gpx_file:
+            gpx = gpxpy.parse(gpx_file)
+        track = Track.from_gpx(gpx)
 
     print(f"Number of tracks: {len(gpx.tracks)}\n")
 
-    for track in gpx.tracks:
-        print(f"Track name: {track.name}")
-        for segment in track.segments:
-            print(f"  Segment has {len(segment.points)} points")
-            print(f"  First 5 points:")
-            for point in segment.points[:5]:
-                print(f"        Lat: {point.latitude:.6f}, Lon: {point.longitude:.6f}, Elevation: {point.elevation}m")
+    for name, segment in zip(track.segment_names, track.segments()):
+        print(f"Track name: {name}")
+        print(f"  Segment has {segment.stop - segment.start} points")
+        print(f"  First 5 points:")
+        for i in range(segment.start, min(segment.start + 5, segment.stop)):
+            print(f"        Lat: {track.latitudes[i]:.6f}, Lon: {track.longitudes[i]:.6f}, "
+                  f"Elevation: {track.original_elevations[i]}m")
 
     print(f"Using elevation source: {elevation_source.get_name()}\n")
 
-    # Correction Loop
-    for track in gpx.tracks:
-        for segment in track.segments:
-            point_count = 0
-            for point in segment.points:
+    with profiler.stage('distance'):
+        distances = cumulative_distance(track.latitudes, track.longitudes)
+        # Restarting per segment, so a segment's corrections don't depend on the segments before it
+        local_distances = segment_distances(track.latitudes, track.longitudes, track.segment_offsets)
+
+    # Segments whose points are unchanged since the last run take their elevations from its output
+    segment_hashes = track.segment_hashes()
+    reused = np.zeros(track.segment_count, dtype=bool)
+    if reuse:
+        with profiler.stage('reuse'):
+            previous = dict(zip(reuse['segments'], read_segment_elevations(reuse['output'])))
+            for i, (segment, segment_hash) in enumerate(zip(track.segments(), segment_hashes)):
+                elevations = previous.get(segment_hash)
+                if elevations is not None and len(elevations) == segment.stop - segment.start:
+                    track.corrected_elevations[segment] = elevations
+                    reused[i] = True
+        print(f"Reusing {np.count_nonzero(reused)} of {track.segment_count} segments unchanged since the last run")
+
+    pending = np.repeat(~reused, np.diff(track.segment_offsets))
+    latitudes = track.latitudes[pending]
+    longitudes = track.longitudes[pending]
+    query_count = len(latitudes)
+    if query_count and (args.snap_grid or args.simplify):
+        # Look up one elevation per grid cell / simplified vertex and spread it back out
+        with profiler.stage('reduce'):
+            segment_offsets = np.concatenate(([0], np.cumsum(pending)))[track.segment_offsets]
+            plan = LookupPlan(latitudes, longitudes, segment_offsets, args.snap_grid, args.simplify)
+        query_count = plan.query_count
+        print(f"Lookup reduction: {len(latitudes)} points -> {plan.query_count} queries ({plan.reduction:.1f}x)")
+        with profiler.stage('lookup'):
+            elevations = elevation_source.get_elevations_array(plan.latitudes, plan.longitudes)
+            track.corrected_elevations[pending] = plan.expand(elevations, local_distances[pending])
+    elif query_count:
+        # Fetch every corrected elevation in one bulk request
+        with profiler.stage('lookup'):
+            track.corrected_elevations[pending] = elevation_source.get_elevations_array(latitudes, longitudes)
 
-                original_elevation = point.elevation
-                point.original_elevation = original_elevation
-                corrected_elevation = correct_elevation(point)
+    # Points the source had no value for, taken before repair fills them in
+    uncorrected = np.isnan(track.corrected_elevations)
+    corrected_count = int(np.count_nonzero(~uncorrected))
 
-                if corrected_elevation is not None:
-                    point.elevation = corrected_elevation
-                    print(f"Original: {original_elevation:.1f}m -> Corrected: {corrected_elevation:.1f}m")
+    # Repair gaps and spikes the source left behind, optionally smoothing the result
+    repair_counts = {'filled': 0, 'outliers': 0, 'smoothed': 0}
+    if not args.no_repair:
+        with profiler.stage('repair'):
+            for segment, segment_reused in zip(track.segments(), reused):
+                if segment_reused:
+                    continue
+                repaired, counts = repair_elevations(local_distances[segment], track.corrected_elevations[segment],
+                                                     args.max_grade, args.smooth, args.smooth_window)
+                track.corrected_elevations[segment] = repaired
+                for name, count in counts.items():
+                    repair_counts[name] += count
+        print(f"Repaired elevations: {repair_counts['filled']} gaps filled, "
+              f"{repair_counts['outliers']} outliers rejected, {repair_counts['smoothed']} points smoothed")
+
+    if args.verbose:
+        for original, corrected in zip(track.original_elevations, track.corrected_elevations):
+            if not np.isnan(corrected):
+                print(f"Original: {original:.1f}m -> Corrected: {corrected:.1f}m")
 
-                point_count += 1
     # Calculate summary statistics
-    original_elevations = []
-    corrected_elevations = []
-    elevation_changes = []
-
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for point in segment.points:
-                if hasattr(point, 'original_elevation'): 
-                    original_elevations.append(point.original_elevation)
-                    corrected_elevations.append(point.elevation)
-                    elevation_changes.append(abs(point.elevation - point.original_elevation))
-
-    # Calculate statistics
-    avg_change = sum(elevation_changes) / len(elevation_changes)
-    max_change = max(elevation_changes)
-    large_changes = len([c for c in elevation_changes if c > 5])
+    with profiler.stage('stats'):
+        original_elevations = track.original_elevations
+        corrected_elevations = track.elevations
+        elevation_changes = np.abs(corrected_elevations - original_elevations)
+        elevation_changes = elevation_changes[~np.isnan(elevation_changes)]
+
+        avg_change = elevation_changes.mean() if len(elevation_changes) else 0.0
+        large_changes = np.count_nonzero(elevation_changes > 5)
+
+        # Grade and elevation gain/loss for the route
+        grades = grade(distances, corrected_elevations)
+        max_grade = float(np.nanmax(np.abs(grades))) if len(track) else 0.0
+        original_gain, original_loss = track_gain_loss(original_elevations, track.segment_offsets,
+                                                       args.gain_threshold)
+        corrected_gain, corrected_loss = track_gain_loss(corrected_elevations, track.segment_offsets,
+                                                         args.gain_threshold)
 
     print(f"\n=== Correction Summary ===")
-    print(f"Total points corrected: {len(elevation_changes)}")
+    print(f"Total points corrected: {corrected_count} of {len(track)}")
     print(f"Average elevation change: {avg_change:.2f}m")
     print(f"Points with >5m change: {large_changes}")
 
-    # Calculate elevation gain/loss for the route
-    def calculate_elevation_gain_loss(elevations):
-        gain = 0
-        loss = 0
-        for i in range(1, len(elevations)):
-            diff = elevations[i] - elevations[i-1]
-            if diff > 0:
-                gain += diff
-            else:
-                loss += abs(diff)
-        return gain, loss
-
-    original_gain, original_loss = calculate_elevation_gain_loss(original_elevations)
-    corrected_gain, corrected_loss = calculate_elevation_gain_loss(corrected_elevations)
+    print(f"Distance: {distances[-1] if len(track) else 0.0:.2f}km, steepest grade: {max_grade:.1f}%")
 
     print(f"\n=== Elevation Gain/Loss ===")
     print(f"Original - Gain: {original_gain:.1f}m, Loss: {original_loss:.1f}m")
@@ -93,13 +189,95 @@ def process_gpx_file(input_path, output_path, args):
     print(f"Difference - Gain: {abs(original_gain - corrected_gain):.1f}m, Loss: {abs(original_loss - corrected_loss):.1f}m")
 
     # Save corrected GPX
-    with open(output_path, 'w') as output_file:
-        output_file.write(gpx.to_xml())
+    with profiler.stage('write'):
+        with open(output_path, 'w') as output_file:
+            output_file.write(track.to_xml())
 
     # Generate visualization unless disabled
+    render = None
     if not args.no_viz:
-        viz_path = output_path.replace('.gpx', '_profile.png')
-        create_elevation_profile(gpx, viz_path)
+        with profiler.stage('render'):
+            from visualization import create_elevation_profile, profile_series
+
+            viz_path = output_path.replace('.gpx', f'_profile.{args.viz_format}')
+            if args.batch and args.viz_jobs:
+                # Only the downsampled profile goes back, batch renders it in its own pool
+                render = {'series': profile_series(track, distances, args.viz_dpi), 'path': viz_path}
+            else:
+                create_elevation_profile(track, viz_path, distances, args.viz_dpi, args.viz_format)
+
+    if args.verbose:
+        print(f"\nCorrected GPX saved to {output_path}")
+
+    profiler.count('points', len(track))
+    profiler.count('queries', query_count)
+    profiler.count('reused_segments', int(np.count_nonzero(reused)))
+    profiler.count_source(source_stats, elevation_source.get_stats())
+
+    result = {
+        'points': len(track),
+        'queries': query_count,
+        'distance_km': float(distances[-1]) if len(track) else 0.0,
+        'corrected': corrected_count,
+        **repair_counts,
+        'avg_change': float(avg_change),
+        'large_changes': int(large_changes),
+        'original_gain': float(original_gain),
+        'original_loss': float(original_loss),
+        'corrected_gain': float(corrected_gain),
+        'corrected_loss': float(corrected_loss),
+        'segments': track.segment_count,
+        'reused_segments': int(np.count_nonzero(reused)),
+        # Only segments the source fully covered are worth reusing next time
+        'segment_hashes': [None if uncorrected[segment].any() else segment_hash
+                           for segment, segment_hash in zip(track.segments(), segment_hashes)],
+        'profile': profiler.to_dict(),
+    }
+    if render:
+        result['render'] = render
+    return result
+
+def process_gpx_stream(input_path, output_path, elevation_source, args, profiler=None):
+    """Correct a GPX file chunk by chunk without loading it into memory"""
+    print(f"Streaming {input_path} in chunks of {args.chunk_size} points")
+    if not args.no_repair:
+        print("Note: gap filling and spike rejection are not applied in --stream mode, "
+              "points without a corrected elevation keep their GPS value")
+    print(f"Using elevation source: {elevation_source.get_name()}\n")
+
+    profiler = profiler or StageProfiler()
+    source_stats = elevation_source.get_stats()
+    with profiler.stage('stream'):
+        stats = stream_correct_gpx(input_path, output_path, elevation_source, args.chunk_size,
+                                   args.gain_threshold, profiler)
+    profiler.count('points', stats['points'])
+    profiler.count_source(source_stats, elevation_source.get_stats())
+
+    # Averaged over points with both an original and a final elevation, like process_gpx_file
+    avg_change = stats['change_total'] / stats['change_count'] if stats['change_count'] else 0.0
+    print(f"\n=== Correction Summary ===")
+    print(f"Total points corrected: {stats['corrected']} of {stats['points']}")
+    print(f"Average elevation change: {avg_change:.2f}m")
+    print(f"Points with >5m change: {stats['large_changes']}")
+
+    print(f"\n=== Elevation Gain/Loss ===")
+    print(f"Original - Gain: {stats['original_gain']:.1f}m, Loss: {stats['original_loss']:.1f}m")
+    print(f"Corrected - Gain: {stats['corrected_gain']:.1f}m, Loss: {stats['corrected_loss']:.1f}m")
+
+    if not args.no_viz:
+        print("Skipping visualization in streaming mode")
 
     if args.verbose:
         print(f"\nCorrected GPX saved to {output_path}")
+
+    return {
+        'points': stats['points'],
+        'corrected': stats['corrected'],
+        'avg_change': avg_change,
+        'large_changes': stats['large_changes'],
+        'original_gain': stats['original_gain'],
+        'original_loss': stats['original_loss'],
+        'corrected_gain': stats['corrected_gain'],
+        'corrected_loss': stats['corrected_loss'],
+        'profile': profiler.to_dict(),
+    }
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+
+DEFAULT_MANIFEST = 'data/cache/manifest.json'
+
+# Arguments that shape a file's output, changing any of them corrects the file again
+SETTINGS = ('source', 'tiers', 'dem', 'usgs_url', 'snap_grid', 'simplify', 'no_repair', 'max_grade',
+            'smooth', 'smooth_window', 'gain_threshold', 'stream', 'no_viz', 'viz_dpi', 'viz_format')
+
+# Run-specific result fields that aren't worth keeping between runs
+TRANSIENT_FIELDS = ('file', 'output', 'status', 'error', 'seconds', 'profile', 'render', 'segment_hashes')
+
+def file_hash(path):
+    """SHA-256 of a file's contents, read in 1MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def settings_for(args):
+    """The output-shaping subset of args, in the form it is stored in the manifest"""
+    return json.loads(json.dumps({name: getattr(args, name) for name in SETTINGS}))
+
+def read_segment_elevations(path):
+    """Read every track segment's elevations from a GPX, Returns a list of arrays with NaN where <ele> is missing"""
+    segments, elevations = [], []
+    for _, element in ET.iterparse(path, events=('end',)):
+        name = element.tag.rsplit('}', 1)[-1]
+        if name == 'trkpt':
+            ele = next((child for child in element if child.tag.rsplit('}', 1)[-1] == 'ele'), None)
+            text = ele.text.strip() if ele is not None and ele.text else ''
+            elevations.append(float(text) if text else np.nan)
+            element.clear()
+        elif name == 'trkseg':
+            segments.append(np.array(elevations, dtype=float))
+            elevations = []
+    return segments
+
+class Manifest:
+    """Record of each input file's last correction, so unchanged work can be skipped
+
+    Entries are keyed on the input's absolute path and hold its content hash, the
+    settings and output used, a hash of that output and one hash per track segment
+    (None for segments that weren't fully corrected).
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f).get('files', {})
+
+    @staticmethod
+    def _key(input_path):
+        return os.path.abspath(input_path)
+
+    def plan(self, input_path, output_path, settings, force=False):
+        """Decide how much of a file needs correcting, Returns (input_hash, previous, reuse)
+
+        previous is the last run's result when neither the input nor its settings and
+        output changed. reuse is {'output', 'segments'} when only the input changed,
+        so its unchanged segments can be read back from the last output. Both are None
+        when the file has to be corrected from scratch.
+        """
+        input_hash = file_hash(input_path)
+        entry = self.entries.get(self._key(input_path))
+        if force or entry is None or entry['settings'] != settings or entry['output'] != str(output_path):
+            return input_hash, None, None
+        # The output has to be exactly what the last run wrote
+        if not os.path.exists(output_path) or file_hash(output_path) != entry['output_hash']:
+            return input_hash, None, None
+        if entry['hash'] == input_hash:
+            return input_hash, entry['result'], None
+        return input_hash, None, {'output': entry['output'], 'segments': entry['segments']}
+
+    def record(self, input_path, input_hash, output_path, settings, result):
+        """Remember a successful correction of input_path"""
+        self.entries[self._key(input_path)] = {
+            'hash': input_hash,
+            'settings': settings,
+            'output': str(output_path),
+            'output_hash': file_hash(output_path),
+            'segments': result.get('segment_hashes', []),
+            'result': {name: value for name, value in result.items() if name not in TRANSIENT_FIELDS},
+        }
+
+    def save(self):
+        """Write the manifest atomically, so an interrupted run leaves the previous one intact"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump({'files': self.entries}, f, indent=2)
+        os.replace(temporary, self.path)
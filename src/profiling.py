@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+import json
+import time
+
+class StageProfiler:
+    """Collects wall time per pipeline stage plus counters for one file"""
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block, repeated stages of the same name add up"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def count_source(self, before, after):
+        """Record how a source's counters moved, e.g. cache hits and fetches during this file"""
+        for name, value in after.items():
+            self.count(name, value - before.get(name, 0))
+
+    def to_dict(self):
+        total = time.perf_counter() - self._start
+        return {
+            'total_seconds': round(total, 6),
+            'stages': {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            'counters': self.counters,
+        }
+
+def write_profile(profile, destination):
+    """Print the profile JSON to stdout for '-', otherwise write it to destination"""
+    text = json.dumps(profile, indent=2)
+    if destination == '-':
+        print(text)
+    else:
+        with open(destination, 'w') as f:
+            f.write(text + '\n')
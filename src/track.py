@@ -0,0 +1,81 @@
+import hashlib
+import math
+import numpy as np
+
+class Track:
+    """Columnar view of every track point in a GPX file, built once per file
+
+    Points from all tracks and segments are stored back to back in contiguous arrays,
+    segment i covers indices segment_offsets[i]:segment_offsets[i + 1]. Missing times
+    and elevations are NaN. Corrected elevations are only written back to the gpxpy
+    objects by write_elevations(), just before saving.
+    """
+
+    def __init__(self, latitudes, longitudes, times, original_elevations,
+                 segment_offsets, segment_names=None, gpx=None):
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.times = np.asarray(times, dtype=float)
+        self.original_elevations = np.asarray(original_elevations, dtype=float)
+        self.corrected_elevations = np.full(len(self.latitudes), np.nan)
+        self.segment_offsets = np.asarray(segment_offsets, dtype=np.int64)
+        self.segment_names = segment_names or [None] * self.segment_count
+        self.gpx = gpx
+
+    @classmethod
+    def from_gpx(cls, gpx):
+        """Build the arrays in a single pass over the gpxpy object tree"""
+        latitudes, longitudes, times, elevations = [], [], [], []
+        segment_offsets = [0]
+        segment_names = []
+
+        for track in gpx.tracks:
+            for segment in track.segments:
+                for point in segment.points:
+                    latitudes.append(point.latitude)
+                    longitudes.append(point.longitude)
+                    times.append(point.time.timestamp() if point.time else np.nan)
+                    elevations.append(np.nan if point.elevation is None else point.elevation)
+                segment_offsets.append(len(latitudes))
+                segment_names.append(track.name)
+
+        return cls(latitudes, longitudes, times, elevations, segment_offsets, segment_names, gpx)
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    @property
+    def segment_count(self):
+        return len(self.segment_offsets) - 1
+
+    def segments(self):
+        """Yield a slice for each segment"""
+        for start, stop in zip(self.segment_offsets[:-1], self.segment_offsets[1:]):
+            yield slice(int(start), int(stop))
+
+    def segment_hashes(self):
+        """Digest of each segment's coordinates, equal digests mean the same points in the same order"""
+        return [hashlib.sha1(np.stack((self.latitudes[segment], self.longitudes[segment])).tobytes()).hexdigest()
+                for segment in self.segments()]
+
+    @property
+    def elevations(self):
+        """Corrected elevations, falling back to the original where no correction exists"""
+        return np.where(np.isnan(self.corrected_elevations), self.original_elevations,
+                        self.corrected_elevations)
+
+    def write_elevations(self):
+        """Copy the final elevations back onto the gpxpy points"""
+        elevations = self.elevations.tolist()
+        index = 0
+        for track in self.gpx.tracks:
+            for segment in track.segments:
+                for point in segment.points:
+                    if not math.isnan(elevations[index]):
+                        point.elevation = elevations[index]
+                    index += 1
+
+    def to_xml(self):
+        """Serialize the GPX with the final elevations"""
+        self.write_elevations()
+        return self.gpx.to_xml()
@@ -0,0 +1,127 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+def point_distances(latitudes, longitudes):
+    """Haversine distance from each point to the next in kilometers, one shorter than the input"""
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    dlat = np.diff(lat)
+    dlon = np.diff(lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def cumulative_distance(latitudes, longitudes):
+    """Calculate cumulative distance along the track in kilometers"""
+    distances = np.zeros(len(latitudes))
+    if len(latitudes) > 1:
+        np.cumsum(point_distances(latitudes, longitudes), out=distances[1:])
+    return distances
+
+def segment_distances(latitudes, longitudes, segment_offsets):
+    """Cumulative distance in kilometers restarting at 0 for every segment"""
+    distances = np.zeros(len(latitudes))
+    for start, stop in zip(segment_offsets[:-1], segment_offsets[1:]):
+        distances[start:stop] = cumulative_distance(latitudes[start:stop], longitudes[start:stop])
+    return distances
+
+def grade(distances, elevations):
+    """Percent grade from the previous point to each point, 0 for the first point and zero-length steps"""
+    run = np.diff(np.asarray(distances, dtype=float)) * 1000
+    rise = np.diff(np.asarray(elevations, dtype=float))
+    grades = np.zeros(len(distances))
+    np.divide(rise * 100, run, out=grades[1:], where=run > 0)
+    return grades
+
+def _turning_points(elevations):
+    """Local peaks and valleys plus both ends, flat runs collapsed to one point"""
+    diffs = np.diff(elevations)
+    elevations = elevations[np.concatenate(([True], diffs != 0))]
+    if len(elevations) < 3:
+        return elevations
+    diffs = np.diff(elevations)
+    return elevations[np.concatenate(([True], diffs[1:] * diffs[:-1] < 0, [True]))]
+
+class GainLossAccumulator:
+    """Elevation gain/loss with hysteresis, fed one array at a time
+
+    With a threshold, a climb or descent only counts once it has moved more than threshold
+    meters from the last confirmed peak or valley, and then counts in full; smaller wiggles
+    are ignored the way Strava and Garmin suppress GPS/barometer noise. The result only
+    depends on the peaks and valleys, so each array is reduced to its turning points with
+    NumPy before the (much shorter) sequential pass. A threshold of 0 sums every positive
+    and negative step, matching the plain point-to-point calculation.
+    """
+
+    def __init__(self, threshold=0.0):
+        self.threshold = threshold
+        self.gain = 0.0
+        self.loss = 0.0
+        self.last = None
+        self.anchor = None
+        self.extreme = None
+        self.direction = 0
+
+    def add(self, elevations):
+        """Feed the next consecutive elevations of the same segment, NaN values are skipped"""
+        elevations = np.asarray(elevations, dtype=float)
+        elevations = elevations[~np.isnan(elevations)]
+        if len(elevations) == 0:
+            return
+        if self.last is None:
+            self.anchor = self.extreme = float(elevations[0])
+        else:
+            elevations = np.concatenate(([self.last], elevations))
+        self.last = float(elevations[-1])
+
+        if self.threshold <= 0:
+            diffs = np.diff(elevations)
+            self.gain += float(diffs[diffs > 0].sum())
+            self.loss += float(abs(diffs[diffs < 0].sum()))
+            return
+
+        threshold = self.threshold
+        anchor, extreme, direction = self.anchor, self.extreme, self.direction
+        for value in _turning_points(elevations)[1:].tolist():
+            if direction == 0:
+                if value - anchor > threshold:
+                    direction, extreme = 1, value
+                elif anchor - value > threshold:
+                    direction, extreme = -1, value
+            elif direction == 1:
+                if value > extreme:
+                    extreme = value
+                elif extreme - value > threshold:
+                    self.gain += extreme - anchor
+                    anchor, extreme, direction = extreme, value, -1
+            else:
+                if value < extreme:
+                    extreme = value
+                elif value - extreme > threshold:
+                    self.loss += anchor - extreme
+                    anchor, extreme, direction = extreme, value, 1
+        self.anchor, self.extreme, self.direction = anchor, extreme, direction
+
+    def totals(self):
+        """Gain and loss so far, including the climb or descent still in progress"""
+        gain, loss = self.gain, self.loss
+        if self.direction == 1:
+            gain += self.extreme - self.anchor
+        elif self.direction == -1:
+            loss += self.anchor - self.extreme
+        return gain, loss
+
+def elevation_gain_loss(elevations, threshold=0.0):
+    """Total gain and loss in meters over one continuous run of elevations"""
+    accumulator = GainLossAccumulator(threshold)
+    accumulator.add(elevations)
+    return accumulator.totals()
+
+def track_gain_loss(elevations, segment_offsets, threshold=0.0):
+    """Gain and loss summed over segments, the jumps between segments are not counted"""
+    gain = loss = 0.0
+    for start, stop in zip(segment_offsets[:-1], segment_offsets[1:]):
+        segment_gain, segment_loss = elevation_gain_loss(elevations[start:stop], threshold)
+        gain += segment_gain
+        loss += segment_loss
+    return gain, loss
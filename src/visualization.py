@@ -1,57 +1,89 @@
-import matplotlib.pyplot as plt
-import math
+import numpy as np
+from track_metrics import cumulative_distance
 
-def calculate_cumulative_distance(points):
-    """Calculate cumulative distance along the track in kilometers"""
-    distances = [0.0]
+FIGURE_SIZE = (12, 6)
+DEFAULT_DPI = 150
+FORMATS = ('png', 'svg', 'pdf', 'jpg')
 
-    for i in range(1, len(points)):
+# One figure per process, redrawn for every profile instead of built from scratch
+_renderer = None
 
-        lat1, lon1 = points[i - 1].latitude, points[i - 1].longitude
-        lat2, lon2 = points[i].latitude, points[i].longitude
+def downsample_minmax(x, y, columns):
+    """Keep only the lowest and highest point of each of columns equal-width x bins
 
-        # Haversine formula
-        R = 6371 # Earth radius in km
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = (math.sin(dlat/2)**2 +
-             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-             math.sin(dlon/2)**2)
-        c = 2 * math.asin(math.sqrt(a))
-        distance = R * c
+    x must be sorted, NaN values of y are dropped. Both extremes are kept in their
+    original order, so peaks and dips survive at any zoom. Returns (x, y).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~np.isnan(y)
+    x, y = x[valid], y[valid]
+    if len(x) <= 2 * columns or x[-1] <= x[0]:
+        return x, y
 
-        distances.append(distances[-1] + distance)
+    bins = np.minimum(((x - x[0]) / (x[-1] - x[0]) * columns).astype(np.int64), columns - 1)
+    # Sorted by bin, then elevation, so each bin's first and last entries are its extremes
+    order = np.lexsort((y, bins))
+    starts = np.flatnonzero(np.diff(bins[order])) + 1
+    lowest = order[np.concatenate(([0], starts))]
+    highest = order[np.concatenate((starts - 1, [len(order) - 1]))]
+    keep = np.unique(np.concatenate((lowest, highest)))
+    return x[keep], y[keep]
 
-    return distances
+def profile_series(track, distances=None, dpi=DEFAULT_DPI):
+    """Downsample a track's original and corrected profiles to the figure's pixel width
 
-def create_elevation_profile(gpx, output_path='data/output/elevation_profile.png'):
-    """Create before and after elevation profile visualization"""
+    Returns {'original': (x, y), 'corrected': (x, y)}, small enough to hand to a render worker.
+    """
+    # Calculate distances unless the caller already has them
+    if distances is None:
+        distances = cumulative_distance(track.latitudes, track.longitudes)
+
+    columns = int(FIGURE_SIZE[0] * dpi)
+    return {
+        'original': downsample_minmax(distances, track.original_elevations, columns),
+        'corrected': downsample_minmax(distances, track.elevations, columns),
+    }
 
-    points = []
-    for track in gpx.tracks:
-        for segment in track.segments:
-            points.extend(segment.points)
+class ProfileRenderer:
+    """Draws elevation profiles on one reusable Agg figure, without pyplot's global state"""
 
-    # Calculate distances
-    distances = calculate_cumulative_distance(points)
+    def __init__(self):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
 
-    # Extract elevations
-    original_elevations = [p.original_elevation for p in points if hasattr(p, 'original_elevation')]
-    corrected_elevations = [p.elevation for p in points]
+        self.figure = Figure(figsize=FIGURE_SIZE)
+        FigureCanvasAgg(self.figure)
+        # Fixed margins, so saving needs a single draw rather than a tight bbox pass
+        self.figure.subplots_adjust(left=0.07, right=0.98, bottom=0.09, top=0.93)
+        self.axes = self.figure.add_subplot()
+        self.original, = self.axes.plot([], [], label='Original GPS', alpha=0.7, linewidth=1.5, color='red')
+        self.corrected, = self.axes.plot([], [], label='Corrected', alpha=0.9, linewidth=2, color='blue')
 
-    # Create the plot
-    plt.figure(figsize=(12, 6))
+        self.axes.set_xlabel('Distance (km)', fontsize=12)
+        self.axes.set_ylabel('Elevation (m)', fontsize=12)
+        self.axes.set_title('Elevation Profile: Original vs Corrected', fontsize=14, fontweight='bold')
+        self.axes.legend(fontsize=10)
+        self.axes.grid(True, alpha=0.3)
 
-    plt.plot(distances, original_elevations, label='Original GPS', alpha=0.7, linewidth=1.5, color='red')
-    plt.plot(distances, corrected_elevations, label='Corrected', alpha=0.9, linewidth=2, color='blue')
+    def render(self, series, output_path, dpi=DEFAULT_DPI, fmt=None):
+        """Save series from profile_series() to output_path, format taken from fmt or the extension"""
+        self.original.set_data(*series['original'])
+        self.corrected.set_data(*series['corrected'])
+        self.axes.relim()
+        self.axes.autoscale_view()
+        self.figure.savefig(output_path, dpi=dpi, format=fmt)
 
-    plt.xlabel('Distance (km)', fontsize=12)
-    plt.ylabel('Elevation (m)', fontsize=12)
-    plt.title('Elevation Profile: Original vs Corrected', fontsize=14, fontweight='bold')
-    plt.legend(fontsize=10)
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
+def render_profile(series, output_path, dpi=DEFAULT_DPI, fmt=None):
+    """Render with this process's shared figure, Returns output_path"""
+    global _renderer
+    if _renderer is None:
+        _renderer = ProfileRenderer()
+    _renderer.render(series, output_path, dpi, fmt)
+    return output_path
 
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    print(f"/nVisualization saved to {output_path}")
-    plt.close()
\ No newline at end of file
+def create_elevation_profile(track, output_path='data/output/elevation_profile.png', distances=None,
+                             dpi=DEFAULT_DPI, fmt=None):
+    """Create before and after elevation profile visualization"""
+    render_profile(profile_series(track, distances, dpi), output_path, dpi, fmt)
+    print(f"\nVisualization saved to {output_path}")
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Modules in src are imported top-level, the same way cli.py runs them
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
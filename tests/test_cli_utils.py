@@ -0,0 +1,18 @@
+import pytest
+from cli_utils import parse_args
+
+@pytest.mark.parametrize('options', [['--smooth', 'median'], ['--max-grade', '30'], ['--snap-grid'],
+                                     ['--simplify', '2'], ['--snap-grid', '--simplify', '2']])
+def test_stream_rejects_whole_track_options(options, capsys):
+    with pytest.raises(SystemExit):
+        parse_args(['input.gpx', '--stream'] + options)
+    assert "can't be used with --stream" in capsys.readouterr().err
+
+@pytest.mark.parametrize('options', [[], ['--no-repair'], ['--chunk-size', '500', '--gain-threshold', '3']])
+def test_stream_accepts_per_chunk_options(options):
+    assert parse_args(['input.gpx', '--stream'] + options).stream
+
+def test_whole_track_options_without_stream():
+    args = parse_args(['input.gpx', '--smooth', 'savgol', '--max-grade', '30', '--snap-grid', '--simplify', '2'])
+    assert (args.smooth, args.max_grade, args.simplify) == ('savgol', 30.0, 2.0)
+    assert args.snap_grid > 0
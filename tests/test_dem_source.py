@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+rasterio = pytest.importorskip('rasterio')
+from rasterio.transform import from_origin
+from rasterio.warp import transform
+from elevation_sources import DEMSource
+
+def write_tile(path, crs, transform_, data, nodata=None):
+    with rasterio.open(path, 'w', driver='GTiff', height=data.shape[0], width=data.shape[1], count=1,
+                       dtype=data.dtype, crs=crs, transform=transform_, nodata=nodata) as dst:
+        dst.write(data, 1)
+
+def test_bilinear_interpolation_between_pixel_centres(tmp_path):
+    # Elevation rises 1m per column, 10m per row going south
+    data = (np.arange(4)[None, :] + 10 * np.arange(4)[:, None]).astype(np.float32)
+    write_tile(tmp_path / 'tile.tif', 'EPSG:4326', from_origin(-69.0, 45.0, 0.01, 0.01), data)
+    source = DEMSource(str(tmp_path))
+    # Halfway between the centres of pixels (1, 1) and (2, 2)
+    latitude, longitude = 45.0 - 0.02, -69.0 + 0.02
+    assert source.get_elevation(latitude, longitude) == pytest.approx(16.5)
+
+def test_points_off_a_projected_raster_are_left_to_other_tiles(tmp_path):
+    # 10km of 10m pixels in UTM 19N away from the central meridian, the grid is rotated
+    # against lat/lon so the tile's geographic bounding box is well outside the raster
+    left, top, size = 700000.0, 4950000.0, 10000
+    write_tile(tmp_path / 'utm.tif', 'EPSG:32619', from_origin(left, top, 10, 10),
+               np.full((1000, 1000), 500, dtype=np.float32))
+    write_tile(tmp_path / 'wide.tif', 'EPSG:4326', from_origin(-67.0, 45.0, 0.01, 0.01),
+               np.full((100, 100), 100, dtype=np.float32))
+    source = DEMSource(str(tmp_path))
+
+    # Near the bottom right corner, 304m east of the raster edge and 5m inside it
+    xs, ys = [left + size + 304, left + size - 5], [top - size + 10, top - size + 10]
+    longitudes, latitudes = transform('EPSG:32619', 'EPSG:4326', xs, ys)
+    elevations = source.get_elevations_array(np.array(latitudes), np.array(longitudes))
+    # utm.tif sorts first, so the outside point only reaches wide.tif if utm.tif leaves it NaN
+    np.testing.assert_allclose(elevations, [100, 500])
+
+def test_points_off_every_tile_are_nan(tmp_path):
+    write_tile(tmp_path / 'tile.tif', 'EPSG:4326', from_origin(-69.0, 45.0, 0.01, 0.01),
+               np.full((10, 10), 5, dtype=np.float32))
+    source = DEMSource(str(tmp_path))
+    assert source.get_elevation(44.0, -69.0) is None
+    assert source.get_elevations([(44.95, -68.95), (46.0, -68.95)]) == [5.0, None]
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from cli_utils import parse_args
+from elevation_sources import ElevationSource
+from main import process_gpx_file
+
+class SlopeSource(ElevationSource):
+    def get_elevation(self, latitude, longitude):
+        return 200 + (latitude - 44.0) * 1000
+
+    def get_elevations_array(self, latitudes, longitudes):
+        return 200 + (np.asarray(latitudes) - 44.0) * 1000
+
+    def get_name(self):
+        return "Slope"
+
+def write_gpx(path, count):
+    points = []
+    for i in range(count):
+        # Every third point was recorded without an elevation
+        ele = '' if i % 3 == 0 else f'<ele>{150 + 5 * np.sin(i / 4):.1f}</ele>'
+        points.append(f'<trkpt lat="{44.0 + i * 1e-4:.6f}" lon="-68.9">{ele}</trkpt>')
+    path.write_text('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="test">'
+                    '<trk><trkseg>' + ''.join(points) + '</trkseg></trk></gpx>\n')
+
+@pytest.mark.parametrize('chunk_size', [7, 1000])
+def test_stream_summary_matches_standard_path(tmp_path, chunk_size):
+    input_path = tmp_path / 'in.gpx'
+    write_gpx(input_path, 100)
+    common = [str(input_path), '--no-viz', '--no-repair']
+    standard = process_gpx_file(str(input_path), str(tmp_path / 'standard.gpx'), parse_args(common), SlopeSource())
+    stream = process_gpx_file(str(input_path), str(tmp_path / 'stream.gpx'),
+                              parse_args(common + ['--stream', '--chunk-size', str(chunk_size)]), SlopeSource())
+
+    for field in ('points', 'corrected', 'avg_change', 'large_changes',
+                  'original_gain', 'original_loss', 'corrected_gain', 'corrected_loss'):
+        assert stream[field] == pytest.approx(standard[field]), field
+
+def test_stream_skips_comments_and_instructions_inside_points(tmp_path):
+    input_path = tmp_path / 'in.gpx'
+    input_path.write_text('<?xml version="1.0" encoding="UTF-8"?>\n'
+                          '<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="test"><trk><trkseg>'
+                          '<trkpt lat="44.1" lon="-68.9"><!-- x --><ele>3</ele></trkpt>'
+                          '<trkpt lat="44.2" lon="-68.9"><!-- no ele --></trkpt>'
+                          '<trkpt lat="44.3" lon="-68.9"><?note y?></trkpt>'
+                          '</trkseg></trk></gpx>\n')
+    output_path = tmp_path / 'stream.gpx'
+    result = process_gpx_file(str(input_path), str(output_path),
+                              parse_args([str(input_path), '--no-viz', '--stream']), SlopeSource())
+
+    assert (result['points'], result['corrected']) == (3, 3)
+    output = output_path.read_text()
+    assert '<!-- x -->' in output and '<?note y?>' in output
+    for elevation in ('300.000', '400.000', '500.000'):
+        assert f'<ele>{elevation}</ele>' in output
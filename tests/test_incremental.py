@@ -0,0 +1,92 @@
+import numpy as np
+from cli_utils import parse_args
+from elevation_sources import ElevationSource
+from main import process_gpx_file
+from manifest import Manifest, read_segment_elevations, settings_for
+
+GPX = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx xmlns="http://www.topografix.com/GPX/1/1" version="1.1" creator="test">
+  <trk><name>Test</name>
+{segments}
+  </trk>
+</gpx>
+"""
+
+def write_gpx(path, segments):
+    body = []
+    for points in segments:
+        body.append('    <trkseg>')
+        body.extend(f'      <trkpt lat="{lat:.6f}" lon="{lon:.6f}"><ele>100.0</ele></trkpt>' for lat, lon in points)
+        body.append('    </trkseg>')
+    path.write_text(GPX.format(segments='\n'.join(body)))
+
+def segment_points(start_lat, count=20):
+    return [(start_lat + i * 1e-4, -68.9) for i in range(count)]
+
+class PatchySource(ElevationSource):
+    """Smooth terrain with no value north of gap_above, like a source that failed for part of a track"""
+
+    def __init__(self, gap_above=None):
+        self.gap_above = gap_above
+        self.lookups = 0
+
+    def get_elevation(self, latitude, longitude):
+        return None
+
+    def get_elevations_array(self, latitudes, longitudes):
+        self.lookups += len(latitudes)
+        elevations = 200 + (np.asarray(latitudes) - 44.0) * 1000
+        if self.gap_above is not None:
+            elevations[np.asarray(latitudes) > self.gap_above] = np.nan
+        return elevations
+
+    def get_name(self):
+        return "Patchy"
+
+def correct(tmp_path, source, force=False):
+    input_path, output_path = tmp_path / 'in.gpx', tmp_path / 'out.gpx'
+    args = parse_args([str(input_path), '--no-viz', '--manifest', str(tmp_path / 'manifest.json')]
+                      + (['--force'] if force else []))
+    manifest = Manifest(args.manifest)
+    settings = settings_for(args)
+    input_hash, previous, reuse = manifest.plan(input_path, output_path, settings, args.force)
+    if previous is not None:
+        return previous
+    result = process_gpx_file(str(input_path), str(output_path), args, source, reuse)
+    manifest.record(input_path, input_hash, output_path, settings, result)
+    manifest.save()
+    return result
+
+def test_unchanged_segments_are_reused_and_match_a_full_run(tmp_path):
+    segments = [segment_points(44.0), segment_points(44.1), segment_points(44.2)]
+    write_gpx(tmp_path / 'in.gpx', segments)
+    correct(tmp_path, PatchySource())
+    assert correct(tmp_path, PatchySource())['points'] == 60
+
+    segments[1][5] = (segments[1][5][0], -68.8999)
+    write_gpx(tmp_path / 'in.gpx', segments)
+    source = PatchySource()
+    result = correct(tmp_path, source)
+    assert result['reused_segments'] == 2
+    assert source.lookups == 20
+    incremental = read_segment_elevations(tmp_path / 'out.gpx')
+
+    correct(tmp_path, PatchySource(), force=True)
+    for reused, fresh in zip(incremental, read_segment_elevations(tmp_path / 'out.gpx')):
+        np.testing.assert_array_equal(reused, fresh)
+
+def test_gap_filled_segments_are_not_reused(tmp_path):
+    segments = [segment_points(44.0), segment_points(44.1)]
+    write_gpx(tmp_path / 'in.gpx', segments)
+    # The source misses the last 3 points of the second segment, repair fills them in
+    result = correct(tmp_path, PatchySource(gap_above=segments[1][16][0]))
+    assert result['filled'] == 3
+    assert result['segment_hashes'][0] is not None
+    assert result['segment_hashes'][1] is None
+
+    segments[0][5] = (segments[0][5][0], -68.8999)
+    write_gpx(tmp_path / 'in.gpx', segments)
+    source = PatchySource()
+    result = correct(tmp_path, source)
+    assert result['reused_segments'] == 0
+    assert source.lookups == 40
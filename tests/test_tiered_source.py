@@ -0,0 +1,84 @@
+import numpy as np
+from elevation_cache import MemoryElevationCache, quantize
+from elevation_sources import ElevationSource, TieredElevationSource
+
+class BoxSource(ElevationSource):
+    """Answers a fixed elevation inside a latitude band, records what it was asked"""
+
+    def __init__(self, south, north, elevation, remote=False):
+        self.south, self.north, self.elevation = south, north, elevation
+        self.remote = remote
+        self.asked = 0
+        self.prefetched = 0
+
+    def prefetch(self, latitudes, longitudes):
+        self.prefetched += len(latitudes)
+
+    def get_elevation(self, latitude, longitude):
+        return None
+
+    def get_elevations_array(self, latitudes, longitudes):
+        self.asked += len(latitudes)
+        latitudes = np.asarray(latitudes)
+        return np.where((latitudes >= self.south) & (latitudes < self.north), self.elevation, np.nan)
+
+    def get_name(self):
+        return f"Box {self.elevation}"
+
+def tiered(cache=None):
+    local = BoxSource(44.0, 44.5, 100.0)
+    remote = BoxSource(44.0, 45.0, 200.0, remote=True)
+    return TieredElevationSource([('dem', local), ('usgs', remote)], cache=cache), local, remote
+
+def from_counts(source):
+    return {name: value for name, value in source.get_stats().items() if name.startswith('from_')}
+
+def test_each_point_comes_from_the_cheapest_tier():
+    cache = MemoryElevationCache()
+    cache.put_many({quantize(44.7, -69.0): 150.0})
+    source, local, remote = tiered(cache)
+
+    elevations = source.get_elevations_array([44.1, 44.6, 44.7, 46.0], [-69.0] * 4)
+    np.testing.assert_array_equal(elevations, [100.0, 200.0, 150.0, np.nan])
+    assert source.last_tiers.tolist() == ['dem', 'usgs', 'cache', 'none']
+    # Only points the earlier tiers missed reach the later ones
+    assert (local.asked, remote.asked) == (3, 2)
+
+def test_memory_hits_are_recorded_as_memory():
+    source, local, remote = tiered()
+    source.get_elevations_array([44.1, 44.6], [-69.0, -69.0])
+    elevations = source.get_elevations_array([44.1, 44.6, 44.1, 46.0], [-69.0] * 4)
+
+    np.testing.assert_array_equal(elevations, [100.0, 200.0, 100.0, np.nan])
+    assert source.last_tiers.tolist() == ['memory', 'memory', 'memory', 'none']
+    assert (local.asked, remote.asked) == (3, 2)
+    counts = from_counts(source)
+    assert counts == {'from_memory': 3, 'from_cache': 0, 'from_dem': 1, 'from_usgs': 1, 'from_none': 1}
+    assert sum(counts.values()) == 6
+
+def test_local_tiers_only_prefetch_what_is_still_unresolved():
+    dem = BoxSource(44.0, 44.5, 100.0)
+    srtm = BoxSource(44.0, 45.0, 150.0)
+    remote = BoxSource(44.0, 46.0, 200.0, remote=True)
+    source = TieredElevationSource([('dem', dem), ('srtm', srtm), ('usgs', remote)])
+
+    source.get_elevations_array([44.1, 44.2, 44.6, 45.5], [-69.0] * 4)
+    assert (dem.prefetched, srtm.prefetched, remote.prefetched) == (4, 2, 0)
+
+    # Nothing left for SRTM once the DEM answers everything
+    source.get_elevations_array([44.3, 44.4], [-69.0] * 2)
+    assert (dem.prefetched, srtm.prefetched) == (6, 2)
+
+class BrokenSource(BoxSource):
+    def prefetch(self, latitudes, longitudes):
+        raise ConnectionError("offline")
+
+def test_failing_tier_falls_through_to_the_next():
+    broken = BrokenSource(44.0, 45.0, 150.0)
+    remote = BoxSource(44.0, 45.0, 200.0, remote=True)
+    source = TieredElevationSource([('srtm', broken), ('usgs', remote)])
+
+    elevations = source.get_elevations_array([44.1, 46.0], [-69.0, -69.0])
+    np.testing.assert_array_equal(elevations, [200.0, np.nan])
+    assert source.last_tiers.tolist() == ['usgs', 'none']
+    assert source.get_stats()['tier_errors'] == 1
@@ -0,0 +1,120 @@
+import math
+import numpy as np
+import pytest
+from track_metrics import GainLossAccumulator, cumulative_distance, elevation_gain_loss
+
+def scalar_cumulative_distance(latitudes, longitudes):
+    """The original point-by-point haversine loop from visualization.py"""
+    distances = [0.0]
+    for i in range(1, len(latitudes)):
+        lat1, lon1 = latitudes[i - 1], longitudes[i - 1]
+        lat2, lon2 = latitudes[i], longitudes[i]
+        R = 6371
+        dlat = math.radians(lat2 - lat1)
+        dlon = math.radians(lon2 - lon1)
+        a = (math.sin(dlat / 2) ** 2 +
+             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
+             math.sin(dlon / 2) ** 2)
+        distances.append(distances[-1] + R * 2 * math.asin(math.sqrt(a)))
+    return distances
+
+def scalar_gain_loss(elevations):
+    """The original gain/loss loop from main.py"""
+    gain = 0
+    loss = 0
+    for i in range(1, len(elevations)):
+        diff = elevations[i] - elevations[i - 1]
+        if diff > 0:
+            gain += diff
+        else:
+            loss += abs(diff)
+    return gain, loss
+
+def hysteresis_reference(elevations, threshold):
+    """Point-by-point hysteresis: a climb or descent counts once it moves more than threshold"""
+    values = [value for value in elevations if not math.isnan(value)]
+    if not values:
+        return 0.0, 0.0
+    gain = loss = 0.0
+    anchor = extreme = values[0]
+    direction = 0
+    for value in values[1:]:
+        if direction == 0:
+            if value - anchor > threshold:
+                direction, extreme = 1, value
+            elif anchor - value > threshold:
+                direction, extreme = -1, value
+        elif direction == 1:
+            if value > extreme:
+                extreme = value
+            elif extreme - value > threshold:
+                gain += extreme - anchor
+                anchor, extreme, direction = extreme, value, -1
+        else:
+            if value < extreme:
+                extreme = value
+            elif value - extreme > threshold:
+                loss += anchor - extreme
+                anchor, extreme, direction = extreme, value, 1
+    if direction == 1:
+        gain += extreme - anchor
+    elif direction == -1:
+        loss += anchor - extreme
+    return gain, loss
+
+def random_track(rng, count):
+    latitudes = 44.5 + np.cumsum(rng.normal(0, 1e-4, count))
+    longitudes = -68.9 + np.cumsum(rng.normal(0, 1e-4, count))
+    elevations = 150 + np.cumsum(rng.normal(0, 1.5, count))
+    return latitudes, longitudes, elevations
+
+def random_chunks(rng, values):
+    """Split values at random positions, empty chunks included"""
+    cuts = np.sort(rng.integers(0, len(values) + 1, size=rng.integers(0, 20)))
+    return np.split(values, cuts)
+
+@pytest.mark.parametrize('count', [1, 2, 3, 1000])
+def test_cumulative_distance_matches_scalar_haversine(count):
+    latitudes, longitudes, _ = random_track(np.random.default_rng(count), count)
+    expected = scalar_cumulative_distance(latitudes.tolist(), longitudes.tolist())
+    np.testing.assert_allclose(cumulative_distance(latitudes, longitudes), expected, rtol=1e-9, atol=1e-12)
+
+def test_cumulative_distance_of_empty_track():
+    # One distance per point, where the old loop always started the list with 0.0
+    assert len(cumulative_distance(np.empty(0), np.empty(0))) == 0
+
+@pytest.mark.parametrize('count', [0, 1, 2, 3, 1000])
+def test_gain_loss_without_threshold_matches_scalar_loop(count):
+    _, _, elevations = random_track(np.random.default_rng(count), count)
+    expected = scalar_gain_loss(elevations.tolist())
+    assert elevation_gain_loss(elevations) == pytest.approx(expected, rel=1e-9, abs=1e-9)
+
+def test_gain_loss_counts_flat_runs_as_nothing():
+    assert elevation_gain_loss(np.array([10.0, 10.0, 12.0, 12.0, 9.0])) == pytest.approx((2.0, 3.0))
+
+@pytest.mark.parametrize('threshold', [0.0, 0.5, 3.0, 10.0])
+@pytest.mark.parametrize('seed', range(10))
+def test_accumulator_in_chunks_matches_point_by_point(threshold, seed):
+    rng = np.random.default_rng(seed)
+    _, _, elevations = random_track(rng, 2000)
+    # Some plateaus and missing values, which the accumulator has to skip
+    elevations[rng.integers(0, 2000, 50)] = np.nan
+    elevations = np.round(elevations)
+
+    accumulator = GainLossAccumulator(threshold)
+    for chunk in random_chunks(rng, elevations):
+        accumulator.add(chunk)
+
+    if threshold:
+        expected = hysteresis_reference(elevations.tolist(), threshold)
+    else:
+        expected = scalar_gain_loss(elevations[~np.isnan(elevations)].tolist())
+    assert accumulator.totals() == pytest.approx(expected, rel=1e-9, abs=1e-9)
+
+@pytest.mark.parametrize('threshold', [0.0, 3.0])
+def test_accumulator_one_point_at_a_time(threshold):
+    _, _, elevations = random_track(np.random.default_rng(42), 500)
+    accumulator = GainLossAccumulator(threshold)
+    for value in elevations:
+        accumulator.add([value])
+    assert accumulator.totals() == pytest.approx(elevation_gain_loss(elevations, threshold), rel=1e-9)